@@ -0,0 +1,468 @@
+"""
+Script developed by https://github.com/turcanustefan/system-baseline-tool
+This script is licensed under the MIT License.
+You are free to use, modify, and distribute this software as long as
+you include the original copyright notice and license terms.
+This software is provided "as is", without warranty of any kind.
+"""
+import functools
+import io
+import json
+import os
+import socket
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from typing import Iterator, Protocol
+
+import binary_baselining
+import boot_logon_baselining
+import cron_baselining
+import user_baselining
+import service_baselining
+import custom_baselining
+import hashdb
+import journal
+# Record and Change are re-exported as the record and change types of the library API
+from utils import Record, Change, iter_records, format_record, diff_records, generate_content_report, generate_timestamp
+
+
+__all__ = [
+    'Record', 'Change', 'Collector', 'COLLECTORS', 'Baseline', 'BaselineWriter', 'configured',
+    'diff', 'diff_zips', 'categories', 'generate_reports',
+]
+
+HASHDB_FILE = 'hashdb'
+MANIFEST_FILE = 'manifest.json'
+METADATA_FILE = 'metadata.json'
+MD5SUMS_DIR = '/var/lib/dpkg/info'
+
+
+class Collector(Protocol):
+    """
+    A source of baseline Records for a single category.
+
+    Every *_baselining module implements this protocol at module level:
+    BASELINE_FILE names the category and collect() lazily yields its Records.
+    """
+    BASELINE_FILE: str
+
+    def collect(self) -> Iterator[Record]:
+        ...
+
+
+COLLECTORS = [
+    binary_baselining,
+    boot_logon_baselining,
+    cron_baselining,
+    user_baselining,
+    service_baselining,
+    custom_baselining,
+]
+
+
+def configured(collector, **kwargs):
+    """Return a Collector whose collect() is called with the given keyword arguments."""
+    return SimpleNamespace(
+        BASELINE_FILE=collector.BASELINE_FILE,
+        collect=functools.partial(collector.collect, **kwargs),
+    )
+
+
+def shard_index(path, shards):
+    """
+    Return the shard a path belongs to.
+
+    The shard is a stable hash of the full path, so a path lands in the same
+    shard on every host and every run, and large directories such as
+    /usr/bin are spread evenly over all shards.
+    """
+    return zlib.crc32(path.encode()) % shards
+
+
+def shard_file(category, index):
+    """Return the file name of a category shard."""
+    return f"{category}.{index}"
+
+
+def category_of(name):
+    """Return the category of a baseline file name, stripping any shard suffix."""
+    category, _, suffix = name.rpartition('.')
+    if category and suffix.isdigit():
+        return category
+    return name
+
+
+def clear_folder(folder, categories):
+    """
+    Remove the baseline files a previous create left in a folder: the hashdb,
+    metadata, manifest and the category and shard files of `categories`.
+    Other files are left alone.
+    """
+    if not os.path.isdir(folder):
+        return
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if not os.path.isfile(path):
+            continue
+        if name in (HASHDB_FILE, MANIFEST_FILE, METADATA_FILE) or category_of(name) in categories:
+            os.remove(path)
+
+
+def snapshot_metadata():
+    """
+    Return the metadata recorded with a baseline of the running system. The
+    timestamp is in UTC so the catalog can order snapshots of hosts in
+    different timezones.
+    """
+    return {'host': socket.gethostname(), 'timestamp': generate_timestamp(utc=True)}
+
+
+def read_md5sums(md5sums_dir=MD5SUMS_DIR):
+    """Return the dpkg md5sums (hashdb) of the running system, empty if there are none."""
+    if md5sums_dir and os.path.isdir(md5sums_dir):
+        return hashdb.extract_md5sums(md5sums_dir)
+    return {}
+
+
+def collect_category(collector, journal_dir=None, resume=False):
+    """
+    Yield the Records of a collector.
+
+    With a journal_dir, every completed Record is appended to the category's
+    journal there. With resume, Records already journaled by an interrupted
+    run are reused for files whose stat is unchanged.
+    """
+    if not journal_dir:
+        yield from collector.collect()
+        return
+    os.makedirs(journal_dir, exist_ok=True)
+    journal_file = os.path.join(journal_dir, collector.BASELINE_FILE)
+    with journal.journaling(journal_file, resume) as category_journal:
+        yield from collector.collect()
+    if category_journal.reused:
+        print(f"{category_journal.reused} records of {collector.BASELINE_FILE} reused from the journal")
+
+
+def _manifest(categories, shards):
+    return json.dumps({
+        'shards': shards,
+        'categories': {category: [shard_file(category, i) for i in range(shards)] for category in categories},
+    }, indent=2)
+
+
+class BaselineWriter:
+    """
+    Write a baseline folder one category at a time, streaming every Record to
+    its category file (or shard file) as it arrives, so a category is never
+    held in memory. Only the paths of the category being written are kept, to
+    skip duplicates.
+
+    Baseline files of an earlier create in the same folder are removed when
+    the writer is opened. Closing it writes the manifest of a sharded baseline.
+    """
+
+    def __init__(self, folder, shards=1, categories=()):
+        self.folder = folder
+        self.shards = shards
+        self.counts = {}
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        stale = set(categories) | {collector.BASELINE_FILE for collector in COLLECTORS} | {hashdb.MISMATCH_BASELINE_FILE}
+        clear_folder(folder, stale)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self, name, lines):
+        with open(os.path.join(self.folder, name), 'w') as f:
+            for line in lines:
+                f.write(line + "\n")
+
+    def write_metadata(self, metadata):
+        if metadata:
+            self._write(METADATA_FILE, [json.dumps(metadata, indent=2)])
+
+    def write_hashdb(self, md5sums):
+        if md5sums:
+            self._write(HASHDB_FILE, hashdb.format_hashdb(md5sums))
+
+    def add(self, category, records):
+        """Consume an iterable of Records into the category's file or shards. Returns the number written."""
+        if self.shards <= 1:
+            names = [category]
+        else:
+            names = [shard_file(category, i) for i in range(self.shards)]
+        files = [open(os.path.join(self.folder, name), 'w') for name in names]
+        seen = set()
+        try:
+            for record in records:
+                if record.path in seen:
+                    continue
+                seen.add(record.path)
+                f = files[shard_index(record.path, self.shards)] if self.shards > 1 else files[0]
+                f.write(format_record(record) + "\n")
+        finally:
+            for f in files:
+                f.close()
+        self.counts[category] = len(seen)
+        return len(seen)
+
+    def close(self):
+        if self.shards > 1:
+            self._write(MANIFEST_FILE, [_manifest(self.counts, self.shards)])
+
+
+class Baseline:
+    """
+    The in-memory state of a host: a dict of path -> Record per category,
+    the dpkg md5sums (hashdb) when available and metadata such as the host
+    name and creation timestamp.
+    """
+
+    def __init__(self, categories=None, md5sums=None, metadata=None):
+        self.categories = categories if categories is not None else {}
+        self.md5sums = md5sums if md5sums is not None else {}
+        self.metadata = metadata if metadata is not None else {}
+
+    def add(self, category, records):
+        """Consume an iterable of Records into the given category."""
+        category_records = self.categories.setdefault(category, {})
+        for record in records:
+            category_records[record.path] = record
+
+    def records(self, category):
+        """Return the dict of path -> Record for a category (empty if missing)."""
+        return self.categories.get(category, {})
+
+    @classmethod
+    def from_records(cls, category, records):
+        """Build a single category baseline from an iterable or generator of Records."""
+        baseline = cls()
+        baseline.add(category, records)
+        return baseline
+
+    @classmethod
+    def collect(cls, collectors=COLLECTORS, md5sums_dir=MD5SUMS_DIR, journal_dir=None, resume=False):
+        """
+        Build a baseline of the running system from the given collectors.
+
+        With a journal_dir, every completed Record is appended to a per-category
+        journal there. With resume, Records already journaled by an interrupted
+        run are reused for files whose stat is unchanged.
+        """
+        baseline = cls(md5sums=read_md5sums(md5sums_dir), metadata=snapshot_metadata())
+        for collector in collectors:
+            baseline.add(collector.BASELINE_FILE, collect_category(collector, journal_dir, resume))
+        return baseline
+
+    @classmethod
+    def from_file(cls, baseline_file, category=None):
+        """
+        Load a single category baseline file or shard.
+
+        The category defaults to the file name without its shard suffix.
+        """
+        category = category or category_of(os.path.basename(baseline_file))
+        with open(baseline_file, 'r') as f:
+            return cls.from_records(category, iter_records(f))
+
+    @classmethod
+    def from_folder(cls, folder):
+        """Load every category file (and the hashdb) from a baseline folder."""
+        baseline = cls()
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if not os.path.isfile(path):
+                continue
+            with open(path, 'r') as f:
+                baseline._load(name, f)
+        return baseline
+
+    @classmethod
+    def from_zip(cls, zip_path):
+        """Load a baseline ZIP created by `create` without extracting it to disk."""
+        baseline = cls()
+        with zipfile.ZipFile(zip_path, 'r') as zip_obj:
+            for name in zip_obj.namelist():
+                if name.endswith('/'):
+                    continue
+                with zip_obj.open(name) as raw:
+                    baseline._load(name, io.TextIOWrapper(raw, encoding='utf-8'))
+        return baseline
+
+    def _load(self, name, lines):
+        if name == HASHDB_FILE:
+            self.md5sums = hashdb.parse_hashdb(lines)
+        elif name == METADATA_FILE:
+            self.metadata = json.loads(''.join(lines))
+        elif name != MANIFEST_FILE:
+            self.add(category_of(name), iter_records(lines))
+
+    def _files(self, shards=1):
+        """Yield (file name, lines) for every file of the baseline folder layout."""
+        if self.metadata:
+            yield METADATA_FILE, [json.dumps(self.metadata, indent=2)]
+        if self.md5sums:
+            yield HASHDB_FILE, hashdb.format_hashdb(self.md5sums)
+        if shards <= 1:
+            for category, records in self.categories.items():
+                yield category, (format_record(record) for record in records.values())
+            return
+
+        for category, records in self.categories.items():
+            buckets = [[] for _ in range(shards)]
+            for record in records.values():
+                buckets[shard_index(record.path, shards)].append(format_record(record))
+            for i, lines in enumerate(buckets):
+                yield shard_file(category, i), lines
+        yield MANIFEST_FILE, [_manifest(self.categories, shards)]
+
+    def save(self, folder, shards=1):
+        """
+        Write the baseline as a folder of category files.
+
+        With shards > 1 every category is split into that many shard files
+        (see shard_index) and a manifest.json listing them is written. Baseline
+        files of an earlier save into the same folder are removed first, so a
+        different shard count cannot leave stale shards or manifest behind.
+        """
+        with BaselineWriter(folder, shards, self.categories) as writer:
+            writer.write_metadata(self.metadata)
+            writer.write_hashdb(self.md5sums)
+            for category, records in self.categories.items():
+                writer.add(category, records.values())
+
+    def save_zip(self, zip_path, shards=1):
+        """Write the baseline straight to a ZIP in the folder layout used by `create`."""
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_obj:
+            for name, lines in self._files(shards):
+                with zip_obj.open(name, 'w') as raw, io.TextIOWrapper(raw, encoding='utf-8') as f:
+                    for line in lines:
+                        f.write(line + "\n")
+
+
+def ordered_categories(names):
+    """Return the unique category names in collector order, unknown ones last."""
+    ordered = [collector.BASELINE_FILE for collector in COLLECTORS]
+    for name in names:
+        if name not in ordered:
+            ordered.append(name)
+    return [name for name in ordered if name in names]
+
+
+def categories(a, b):
+    """Return the category names of two baselines in collector order."""
+    return ordered_categories(list(a.categories) + list(b.categories))
+
+
+def diff(a, b, use_hashdb=False):
+    """
+    Compare two baselines.
+
+    Args:
+        a (Baseline): The old system state
+        b (Baseline): The new system state
+        use_hashdb (bool): Drop binary changes whose hash is in b's hashdb (Debian only)
+
+    Yields:
+        Change: Every added, removed and changed file, grouped by category
+    """
+    for category in categories(a, b):
+        changes = diff_records(a.records(category), b.records(category), category)
+        if use_hashdb and category == binary_baselining.BASELINE_FILE:
+            changes = binary_baselining.filter_hashdb_changes(changes, b.md5sums)
+        yield from changes
+
+
+def generate_reports(changes, reports_folder, report_categories=(), old_name="", new_name="", options=None):
+    """
+    Write one HTML report per category for an iterable of Changes.
+
+    Categories listed in report_categories get a report even when unchanged.
+    `options` (line_diff.DiffOptions) sets the content diff context and limits.
+    """
+    if not os.path.exists(reports_folder):
+        os.makedirs(reports_folder)
+    grouped = {category: [] for category in report_categories}
+    for change in changes:
+        grouped.setdefault(change.category, []).append(change)
+    for category, category_changes in grouped.items():
+        if category == binary_baselining.BASELINE_FILE:
+            report_html = binary_baselining.generate_report(category_changes, old_name, new_name)
+        else:
+            report_html = generate_content_report(category_changes, options)
+        with open(os.path.join(reports_folder, category + ".html"), "w") as f:
+            f.write(report_html)
+
+
+def read_manifest(zip_path):
+    """Return the shard manifest of a baseline ZIP, None if it is not sharded."""
+    with zipfile.ZipFile(zip_path, 'r') as zip_obj:
+        if MANIFEST_FILE not in zip_obj.namelist():
+            return None
+        with zip_obj.open(MANIFEST_FILE) as f:
+            return json.load(f)
+
+
+def read_zip_records(zip_path, name):
+    """Read a single baseline file (or shard) of a ZIP into a dict of path -> Record."""
+    with zipfile.ZipFile(zip_path, 'r') as zip_obj:
+        if name not in zip_obj.namelist():
+            return {}
+        with zip_obj.open(name) as raw:
+            return {record.path: record for record in iter_records(io.TextIOWrapper(raw, encoding='utf-8'))}
+
+
+# Hashdb of the new baseline, loaded once per compare worker process
+_worker_md5sums = {}
+
+
+def _init_worker(new_zip, use_hashdb):
+    global _worker_md5sums
+    if use_hashdb:
+        with zipfile.ZipFile(new_zip, 'r') as zip_obj:
+            if HASHDB_FILE in zip_obj.namelist():
+                with zip_obj.open(HASHDB_FILE) as raw:
+                    _worker_md5sums = hashdb.parse_hashdb(io.TextIOWrapper(raw, encoding='utf-8'))
+
+
+def _diff_shard(task):
+    old_zip, new_zip, category, name, use_hashdb = task
+    changes = diff_records(read_zip_records(old_zip, name), read_zip_records(new_zip, name), category)
+    if use_hashdb and category == binary_baselining.BASELINE_FILE:
+        changes = binary_baselining.filter_hashdb_changes(changes, _worker_md5sums)
+    return list(changes)
+
+
+def diff_zips(old_zip, new_zip, use_hashdb=False, workers=None):
+    """
+    Compare two baseline ZIPs, diffing matching shards in a process pool.
+
+    Baselines sharded with the same shard count are compared shard by shard
+    in `workers` processes and the results are merged in category then shard
+    order. Anything else falls back to an in-process diff().
+
+    Yields:
+        Change: Every added, removed and changed file, grouped by category
+    """
+    old_manifest = read_manifest(old_zip)
+    new_manifest = read_manifest(new_zip)
+    if not (old_manifest and new_manifest and old_manifest['shards'] == new_manifest['shards']):
+        yield from diff(Baseline.from_zip(old_zip), Baseline.from_zip(new_zip), use_hashdb)
+        return
+
+    shards = new_manifest['shards']
+    names = list(old_manifest['categories']) + list(new_manifest['categories'])
+    tasks = [
+        (old_zip, new_zip, category, shard_file(category, i), use_hashdb)
+        for category in ordered_categories(names)
+        for i in range(shards)
+    ]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(new_zip, use_hashdb)) as executor:
+        for changes in executor.map(_diff_shard, tasks):
+            yield from changes
@@ -7,6 +7,7 @@ This software is provided "as is", without warranty of any kind.
 """
 import argparse
 import os
+import shutil
 import zipfile
 
 import binary_baselining 
@@ -16,7 +17,11 @@ import user_baselining
 import service_baselining
 import custom_baselining
 import utils
+import api
+import catalog
 import hashdb
+import journal
+from line_diff import DiffOptions
 # try:
 #     import create_hashdb
 # except ImportError:
@@ -24,13 +29,27 @@ import hashdb
 #     print("Module 'create_hashdb' failed to load.")
 
 
-CRON_BASELINE_FILE = "cron_baseline"
-BOOT_LOGON_BASELINE_FILE = "boot_logon_baseline"
-BINARY_BASELINE_FILE = "binary_baseline"
-SERVICE_BASELINE_FILE = "service_baseline"
-USER_BASELINE_FILE = "user_baseline"
-CUSTOM_BASELINE_FILE = "custom_baseline"
-HASHDB_FILE = 'hashdb'
+CRON_BASELINE_FILE = cron_baselining.BASELINE_FILE
+BOOT_LOGON_BASELINE_FILE = boot_logon_baselining.BASELINE_FILE
+BINARY_BASELINE_FILE = binary_baselining.BASELINE_FILE
+SERVICE_BASELINE_FILE = service_baselining.BASELINE_FILE
+USER_BASELINE_FILE = user_baselining.BASELINE_FILE
+CUSTOM_BASELINE_FILE = custom_baselining.BASELINE_FILE
+HASHDB_FILE = api.HASHDB_FILE
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def fraction(value):
+    number = float(value)
+    if not 0.0 <= number <= 1.0:
+        raise argparse.ArgumentTypeError(f"must be between 0 and 1, got {value}")
+    return number
+
 
 def zip_folder(folder_path, output_path):
     with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zip_obj:
@@ -40,82 +59,76 @@ def zip_folder(folder_path, output_path):
                 zip_obj.write(file_path, os.path.relpath(file_path, folder_path))
 
 
-def create_baselines(baseline_name):
-    config_file = 'config.json'
+def create_baselines(baseline_name, shards=1, collectors=api.COLLECTORS, resume=False, package_index=None):
     baseline_folder = os.path.join(os.getcwd(), baseline_name)
-    if not os.path.exists(baseline_folder):
-        # Create the directory
-        os.mkdir(baseline_folder)
-    
-    # HASHDB
-    md5sums_dir = '/var/lib/dpkg/info'
-    if os.path.isdir(md5sums_dir):
-        output_file = os.path.join(baseline_folder, HASHDB_FILE)
-        md5sums = hashdb.extract_md5sums(md5sums_dir)
-        hashdb.save_to_file(md5sums, output_file)
-        print(f"MD5 sums saved to {output_file}")
-    # BINARY
-    binary_baselining.create_baseline(os.path.join(baseline_folder, BINARY_BASELINE_FILE))
-    # BOOT
-    boot_logon_baselining.create_baseline(os.path.join(baseline_folder, BOOT_LOGON_BASELINE_FILE))
-    # CRON
-    cron_baselining.create_baseline(os.path.join(baseline_folder, CRON_BASELINE_FILE))
-    # USER
-    user_baselining.create_baseline(os.path.join(baseline_folder, USER_BASELINE_FILE))
-    # SERVICE
-    service_baselining.create_baseline(os.path.join(baseline_folder, SERVICE_BASELINE_FILE))
-    # CUSTOM
-    custom_baselining.create_baseline(config_file, os.path.join(baseline_folder, CUSTOM_BASELINE_FILE))
+    journal_dir = os.path.join(baseline_folder, journal.JOURNAL_DIR)
+    if not resume:
+        shutil.rmtree(journal_dir, ignore_errors=True)
+    # the package index already holds the md5sums
+    md5sums = package_index.md5sums if package_index else api.read_md5sums()
+    # every category is streamed to its file as its collector yields it
+    with api.BaselineWriter(baseline_folder, shards) as writer:
+        writer.write_metadata(api.snapshot_metadata())
+        writer.write_hashdb(md5sums)
+        for collector in collectors:
+            writer.add(collector.BASELINE_FILE, api.collect_category(collector, journal_dir, resume))
+        if package_index:
+            writer.add(hashdb.MISMATCH_BASELINE_FILE, package_index.mismatches)
+            print(f"{package_index.trusted} package-owned files trusted, {package_index.verified} verified, "
+                  f"{len(package_index.mismatches)} not matching their package md5sums")
+            for record in package_index.mismatches:
+                print(f"{record.path} does not match its package md5sum")
+    shutil.rmtree(journal_dir, ignore_errors=True)
+    for category, count in writer.counts.items():
+        print(f"{count} records collected for {category}")
+    if md5sums:
+        print(f"MD5 sums saved to {os.path.join(baseline_folder, HASHDB_FILE)}")
     zip_folder(baseline_folder, baseline_name + ".zip")
+    print(f"Baseline created at {baseline_name}.zip")
 
 
-def compare_baselines(old_baseline, new_baseline, use_hash_db=False):
-    old_filename, old_file_extension = os.path.splitext(old_baseline)
+def compare_baselines(old_baseline, new_baseline, use_hash_db=False, workers=None, diff_options=None):
     new_filename, new_file_extension = os.path.splitext(new_baseline)
-    
-    with zipfile.ZipFile(old_baseline, 'r') as zip_file:
-        zip_file.extractall(old_filename)
-    with zipfile.ZipFile(new_baseline, 'r') as zip_file:
-        zip_file.extractall(new_filename)
 
     reports_folder = os.path.join(os.getcwd(), 'reports','{0}'.format(new_filename.split('\\')[-1]))
-    if not os.path.exists(reports_folder):
-        # Create the directory
-        os.makedirs(reports_folder)
-
-    # Instantiate HASHDB
-    md5sums = hashdb.read_hashdb(os.path.join(new_filename, HASHDB_FILE))
-
-    # BINARY BASELINE
-    baseline1_file = os.path.join(old_filename, BINARY_BASELINE_FILE)
-    baseline2_file = os.path.join(new_filename, BINARY_BASELINE_FILE)
-    binary_report = os.path.join(reports_folder, BINARY_BASELINE_FILE + ".html")
-    binary_baselining.compare_baselines(baseline1_file, baseline2_file, binary_report, md5sums, use_hash_db)
-    # BOOT
-    baseline1_file = os.path.join(old_filename, BOOT_LOGON_BASELINE_FILE)
-    baseline2_file = os.path.join(new_filename, BOOT_LOGON_BASELINE_FILE)
-    boot_logon_report = os.path.join(reports_folder, BOOT_LOGON_BASELINE_FILE + ".html")
-    utils.compare_baselines_content(baseline1_file, baseline2_file, boot_logon_report)
-    # CRON
-    baseline1_file = os.path.join(old_filename, CRON_BASELINE_FILE)
-    baseline2_file = os.path.join(new_filename, CRON_BASELINE_FILE)
-    cron_report = os.path.join(reports_folder, CRON_BASELINE_FILE + ".html")
-    utils.compare_baselines_content(baseline1_file, baseline2_file, cron_report)
-    # USER
-    baseline1_file = os.path.join(old_filename, USER_BASELINE_FILE)
-    baseline2_file = os.path.join(new_filename, USER_BASELINE_FILE)
-    user_report = os.path.join(reports_folder, USER_BASELINE_FILE + ".html")
-    utils.compare_baselines_content(baseline1_file, baseline2_file, user_report)
-    # SERVICE
-    baseline1_file = os.path.join(old_filename, SERVICE_BASELINE_FILE)
-    baseline2_file = os.path.join(new_filename, SERVICE_BASELINE_FILE)
-    service_report = os.path.join(reports_folder, SERVICE_BASELINE_FILE + ".html")
-    utils.compare_baselines_content(baseline1_file, baseline2_file, service_report)
-    # CUSTOM
-    baseline1_file = os.path.join(old_filename, CUSTOM_BASELINE_FILE)
-    baseline2_file = os.path.join(new_filename, CUSTOM_BASELINE_FILE)
-    service_report = os.path.join(reports_folder, CUSTOM_BASELINE_FILE + ".html")
-    utils.compare_baselines_content(baseline1_file, baseline2_file, service_report)
+
+    changes = api.diff_zips(old_baseline, new_baseline, use_hash_db, workers)
+    report_categories = [collector.BASELINE_FILE for collector in api.COLLECTORS]
+    api.generate_reports(changes, reports_folder, report_categories, old_baseline, new_baseline, diff_options)
+
+
+def index_baselines(catalog_file, baseline_files, host=None):
+    baseline_catalog = catalog.Catalog(catalog_file)
+    try:
+        for baseline_file in baseline_files:
+            if baseline_catalog.index(baseline_file, host):
+                print(f"Indexed {baseline_file}")
+            else:
+                print(f"{baseline_file} is already indexed")
+    finally:
+        baseline_catalog.close()
+
+
+def query_catalog(catalog_file, path=None, digest=None, host=None):
+    baseline_catalog = catalog.Catalog(catalog_file)
+    try:
+        if path:
+            for entry_host, timestamp, entry_digest in baseline_catalog.path_timeline(path, host):
+                print(f"{entry_host} {timestamp} {entry_digest or 'removed'}")
+        if digest:
+            first_seen, last_seen = baseline_catalog.digest_seen(digest)
+            print(f"first seen: {first_seen}")
+            print(f"last seen: {last_seen}")
+            print(f"current hosts: {' '.join(baseline_catalog.hosts_with_digest(digest))}")
+    finally:
+        baseline_catalog.close()
+
+
+def dry_run_custom(config_file):
+    stats, (kept_files, kept_bytes) = custom_baselining.dry_run(config_file)
+    for rule, (files, size) in sorted(stats.items()):
+        print(f"{rule}: {files} files, {size} bytes removed")
+    print(f"kept: {kept_files} files, {kept_bytes} bytes")
 
 
 if __name__ == '__main__':
@@ -133,17 +146,59 @@ if __name__ == '__main__':
     # create subparser
     create_parser = subparsers.add_parser('create', help='Create baseline')
     create_parser.add_argument('baseline_name', type=str, help='Name of the baseline you want to create')
+    create_parser.add_argument('--shards', type=positive_int, default=1, help='Split every category into N shards by a stable hash of the file path.')
+    create_parser.add_argument('--resume', action='store_true', default=False, help='Resume an interrupted create, reusing the journaled records of unchanged files.')
+    create_parser.add_argument('--trust-packages', action='store_true', default=False, help='Record dpkg-owned binaries with their package md5 and only hash those changed since install (Debian only).')
+    create_parser.add_argument('--package-sample', type=fraction, default=0.0, help='With --trust-packages, also hash this fraction (0-1) of the trusted files.')
+    create_parser.add_argument('--home-workers', type=positive_int, default=user_baselining.HOME_SCAN_WORKERS, help='Number of home directories scanned concurrently.')
+    create_parser.add_argument('--home-timeout', type=float, default=user_baselining.HOME_SCAN_TIMEOUT, help='Seconds before a home directory (and, on network filesystems, its mount) is given up.')
+    create_parser.add_argument('--network-homes', choices=['scan', 'separate', 'skip'], default=user_baselining.NETWORK_HOMES, help='How to handle homes on network filesystems.')
+
+    # dry-run subparser
+    dry_run_parser = subparsers.add_parser('dry-run', help='report what the custom baseline rules remove')
+    dry_run_parser.add_argument('--config', type=str, default=custom_baselining.CONFIG_FILE, help='config file with the custom files, folders and options')
 
     # compare subparser
     compare_parser = subparsers.add_parser('compare', help='compare two baselines')
     compare_parser.add_argument('old_baseline_file', type=str, help='baseline file for the old system state')
     compare_parser.add_argument('new_baseline_file', type=str, help='baseline file for the new system state')
     compare_parser.add_argument('--use-hashdb', action='store_true', default=False, help='Use the hashdb from the baseline to exclude FPs (Debian only).')
+    compare_parser.add_argument('--workers', type=positive_int, default=None, help='Number of processes used to compare sharded baselines (default: CPU count).')
+    compare_parser.add_argument('--context-lines', type=int, default=DiffOptions().context, help='Unchanged lines shown around each change in content diffs.')
+    compare_parser.add_argument('--max-diff-lines', type=int, default=DiffOptions().max_lines, help='Only summarize content diffs of files with more lines (old + new).')
+    compare_parser.add_argument('--max-diff-seconds', type=float, default=DiffOptions().max_seconds, help='Only summarize content diffs taking longer than this.')
     #compare_parser.add_argument('report_file', type=str, help='output file to write comparison report to')
 
+    # index subparser
+    index_parser = subparsers.add_parser('index', help='index baselines into a SQLite catalog')
+    index_parser.add_argument('catalog_file', type=str, help='SQLite catalog file, created if missing')
+    index_parser.add_argument('baseline_files', type=str, nargs='+', help='baseline ZIP files to index')
+    index_parser.add_argument('--host', type=str, default=None, help='Host name for baselines without metadata (default: baseline name).')
+
+    # query subparser
+    query_parser = subparsers.add_parser('query', help='query a baseline catalog')
+    query_parser.add_argument('catalog_file', type=str, help='SQLite catalog file')
+    query_parser.add_argument('--path', type=str, default=None, help='Show the change timeline of a path.')
+    query_parser.add_argument('--digest', type=str, default=None, help='Show when a digest was first/last seen and the hosts currently running it.')
+    query_parser.add_argument('--host', type=str, default=None, help='Restrict the path timeline to a host.')
+
     args = parser.parse_args()
 
     if args.command == 'create':
-        create_baselines(args.baseline_name)
+        user_collector = api.configured(user_baselining, workers=args.home_workers, timeout=args.home_timeout, network_homes=args.network_homes)
+        collectors = [user_collector if collector is user_baselining else collector for collector in api.COLLECTORS]
+        package_index = None
+        if args.trust_packages and os.path.isdir(api.MD5SUMS_DIR):
+            package_index = hashdb.PackageIndex(api.MD5SUMS_DIR, args.package_sample)
+            binary_collector = api.configured(binary_baselining, package_index=package_index)
+            collectors = [binary_collector if collector is binary_baselining else collector for collector in collectors]
+        create_baselines(args.baseline_name, args.shards, collectors, args.resume, package_index)
     elif args.command == 'compare':
-        compare_baselines(args.old_baseline_file, args.new_baseline_file, args.use_hashdb)
+        diff_options = DiffOptions(args.context_lines, args.max_diff_lines, args.max_diff_seconds)
+        compare_baselines(args.old_baseline_file, args.new_baseline_file, args.use_hashdb, args.workers, diff_options)
+    elif args.command == 'dry-run':
+        dry_run_custom(args.config)
+    elif args.command == 'index':
+        index_baselines(args.catalog_file, args.baseline_files, args.host)
+    elif args.command == 'query':
+        query_catalog(args.catalog_file, args.path, args.digest, args.host)
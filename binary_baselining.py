@@ -7,95 +7,88 @@ This software is provided "as is", without warranty of any kind.
 """
 import os
 import difflib
+import itertools
 from concurrent.futures import ThreadPoolExecutor
-from utils import hash_file, hash_file_md5, generate_report, is_hash_in_hashdb2
+import pipeline
+from pipeline import PIPELINE_QUEUE_SIZE
+from utils import Record, hash_file_md5, is_hash_in_hashdb2, read_baseline, diff_records, write_baseline
+from journal import cached_record
 
 
-def compare_baselines(baseline1, baseline2, report, md5sums, use_md5sums=False):
-    """Compare two baselines and write differences to an HTML report file."""
-    
-    old_baseline = {}
-    with open(baseline1, 'r') as f:
-        for line in f:
-            try:
-                file_path, file_hash = line.strip().split(' ')
-                old_baseline[file_path] = file_hash
-            except:
-                continue
-
-    new_baseline = {}
-    with open(baseline2, 'r') as f:
-        for line in f:
-            try:
-                file_path, file_hash = line.strip().split(' ')
-                new_baseline[file_path] = file_hash
-            except:
-                continue
-
-    added_files = {}
-    removed_files = {}
-    changed_files = {}
+BASELINE_FILE = "binary_baseline"
+
 
+def filter_hashdb_changes(changes, md5sums):
+    """Drop changes whose new hash is known to the package hashdb."""
+    for change in changes:
+        if change.new and is_hash_in_hashdb2(md5sums, change.path, change.new.hash):
+            continue
+        yield change
+
+
+def generate_report(changes, old_name, new_name):
+    """Generates an HTML report of added and changed binaries."""
     baseline1_lines = []
     baseline2_lines = []
-
-    for file_path, new_file_hash in new_baseline.items():
-        old_file_hash = old_baseline.get(file_path)
-        if not old_file_hash:
-            found_hash = None
-            if use_md5sums:
-                found_hash = is_hash_in_hashdb2(md5sums, file_path, new_file_hash)
-            if not found_hash:
-                added_files[file_path] = (None, new_file_hash)
-                baseline1_lines.append(f"{file_path} X")
-                baseline2_lines.append(f"{file_path} {new_file_hash}")
-        elif old_file_hash != new_file_hash:
-            found_hash = None
-            if use_md5sums:
-                found_hash = is_hash_in_hashdb2(md5sums, file_path, new_file_hash)
-            if not found_hash:
-                changed_files[file_path] = (new_file_hash, new_file_hash)
-                baseline2_lines.append(f"{file_path} {new_file_hash}")
-                baseline1_lines.append(f"{file_path} {old_file_hash}")
+    for change in changes:
+        if change.kind == 'added':
+            baseline1_lines.append(f"{change.path} X")
+            baseline2_lines.append(f"{change.path} {change.new.hash}")
+        elif change.kind == 'changed':
+            baseline2_lines.append(f"{change.path} {change.new.hash}")
+            baseline1_lines.append(f"{change.path} {change.old.hash}")
     report_data = []
     for i in range(0, len(baseline1_lines), 100):
-        results = difflib.HtmlDiff(tabsize=2).make_file(baseline1_lines[i:i+100], baseline2_lines[i:i+100], baseline1, baseline2)
+        results = difflib.HtmlDiff(tabsize=2).make_file(baseline1_lines[i:i+100], baseline2_lines[i:i+100], old_name, new_name)
         report_data.append(results)
-    #results = generate_report(added_files, removed_files, changed_files)
 
-    report_html = '<html><body>' + ''.join(report_data) + '</body></html>'
+    return '<html><body>' + ''.join(report_data) + '</body></html>'
+
+
+def compare_baselines(baseline1, baseline2, report, md5sums, use_md5sums=False):
+    """Compare two baselines and write differences to an HTML report file."""
+    changes = diff_records(read_baseline(baseline1), read_baseline(baseline2))
+    if use_md5sums:
+        changes = filter_hashdb_changes(changes, md5sums)
+
+    report_html = generate_report(changes, baseline1, baseline2)
     with open(report, "w") as f:
         f.write(report_html)
 
 
-def get_binaries():
-    """Get a list of all binaries in PATH directories."""
-    binaries = []
+def iter_binaries():
+    """Yield all binaries in PATH directories."""
     paths = os.environ["PATH"].split(os.pathsep)
     for path in paths:
         if os.path.isdir(path):
             for filename in os.listdir(path):
                 filepath = os.path.join(path, filename)
                 if os.path.isfile(filepath) and os.access(filepath, os.X_OK):
-                    binaries.append(filepath)
-    return binaries
+                    yield filepath
 
 
-def get_libraries():
-    """Get a list of all shared libraries on the system."""
-    libraries = []
+def get_binaries():
+    """Get a list of all binaries in PATH directories."""
+    return list(iter_binaries())
+
+
+def iter_libraries():
+    """Yield all shared libraries on the system."""
     known_lib_dirs = ["/usr/lib", "/usr/local/lib", "/usr/local/lib64", "/usr/lib64"]
     for lib_dir in known_lib_dirs:
         for root, dirs, files in os.walk(lib_dir):
             for filename in files:
                 if filename.endswith(".so"):
-                    libraries.append(os.path.join(root, filename))
-    return libraries
+                    yield os.path.join(root, filename)
 
 
-def get_kernel_binaries():
+def get_libraries():
     """Get a list of all shared libraries on the system."""
-    kernel_binaries = []
+    return list(iter_libraries())
+
+
+def iter_kernel_binaries():
+    """Yield all kernel modules of the running kernel."""
     kernel_module_dir = '/lib/modules/{}/kernel/'.format(os.uname().release)
     for root, dirs, files in os.walk(kernel_module_dir):
         for filename in files:
@@ -105,13 +98,16 @@ def get_kernel_binaries():
             if os.path.islink(path):
                 path = os.path.realpath(path)
             if filename.endswith(".ko"):
-                kernel_binaries.append(path)
-    return kernel_binaries
+                yield path
 
 
-def get_systemd_generators():
-    """Get a list of all systemd generators on the system."""
-    systemd_generators = []
+def get_kernel_binaries():
+    """Get a list of all shared libraries on the system."""
+    return list(iter_kernel_binaries())
+
+
+def iter_systemd_generators():
+    """Yield all systemd generators on the system."""
     systemd_generators_dirs = [
         '/etc/systemd/system-generators/',
         '/usr/local/lib/systemd/system-generators/',
@@ -123,9 +119,22 @@ def get_systemd_generators():
                 path = os.path.join(root, filename)
                 if os.path.islink(path):
                     path = os.path.realpath(path)
-                systemd_generators.append(path)
+                yield path
+
 
-    return systemd_generators
+def get_systemd_generators():
+    """Get a list of all systemd generators on the system."""
+    return list(iter_systemd_generators())
+
+
+def iter_filepaths():
+    """Yield every binary, library, kernel module and systemd generator once."""
+    seen = set()
+    sources = (iter_binaries(), iter_libraries(), iter_kernel_binaries(), iter_systemd_generators())
+    for filepath in itertools.chain(*sources):
+        if filepath not in seen:
+            seen.add(filepath)
+            yield filepath
 
 
 def hash_files(filepaths, num_threads=4):
@@ -135,15 +144,36 @@ def hash_files(filepaths, num_threads=4):
     return dict(zip(filepaths, results))
 
 
+def _record_binary(filepath):
+    return Record(filepath, hash_file_md5(filepath), None)
+
+
+def record_binary(filepath):
+    """Return the hash-only Record of a binary."""
+    return cached_record(filepath, _record_binary)
+
+
+def collect(num_threads=4, package_index=None, queue_size=PIPELINE_QUEUE_SIZE):
+    """
+    Yield a Record for every binary and library on the system.
+
+    Walking, hashing (num_threads) and the caller writing the Records run as
+    overlapping pipeline stages connected by bounded queues; the queue depth
+    stats printed at the end show which stage was the bottleneck.
+
+    With a hashdb.PackageIndex, package-owned files are trusted and only
+    verified (see PackageIndex.record); unowned files are always hashed.
+    """
+    if package_index is None:
+        work = record_binary
+    else:
+        work = lambda filepath: package_index.record(filepath) or record_binary(filepath)
+    stats = []
+    yield from pipeline.run(iter_filepaths(), work, num_threads, queue_size, stats)
+    for stage in stats:
+        print(stage.summary())
+
+
 def create_baseline(baseline_file):
     """Create a baseline of all binaries and libraries on the system."""
-    binaries = get_binaries()
-    libraries = get_libraries()
-    kernel_binaries = get_kernel_binaries()
-    systemd_generators = get_systemd_generators()
-    filepaths = binaries + libraries + kernel_binaries + systemd_generators
-    hashes = hash_files(filepaths)
-    with open(baseline_file, "w") as f:
-        for filepath, hashvalue in hashes.items():
-            f.write(f"{filepath} {hashvalue}\n")
-    print(f"Baseline created at {baseline_file}")
\ No newline at end of file
+    write_baseline(baseline_file, collect())
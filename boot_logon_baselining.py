@@ -5,9 +5,9 @@ You are free to use, modify, and distribute this software as long as
 you include the original copyright notice and license terms.
 This software is provided "as is", without warranty of any kind.
 """
-import hashlib
-import base64
 import os
+from utils import read_content_record, write_baseline
+from journal import cached_record
 
 
 COMMON_LOGON_DIRS = [
@@ -16,24 +16,16 @@ COMMON_LOGON_DIRS = [
     '/etc/init.d/',
     '/etc/update-motd.d/'
     ]
+BASELINE_FILE = "boot_logon_baseline"
 
-def create_baseline(baseline_file):
-    """Generates a baseline of all files in a directory."""
-    baseline = {}
+def collect():
+    """Yield a Record for every file in the boot and logon directories."""
     for directory in COMMON_LOGON_DIRS:
         for root, dirs, files in os.walk(directory):
             for filename in files:
-                path = os.path.join(root, filename)
-                with open(path, 'rb') as f:
-                    content = f.read()
-                    content_b64 = base64.b64encode(content).decode()
-                    hash_value = hashlib.sha256(content).hexdigest()
-                    baseline[path] = {
-                        'hash': hash_value, 
-                        'content': content_b64
-                    }
+                yield cached_record(os.path.join(root, filename), read_content_record)
+
 
-    with open(baseline_file, 'w') as f:
-        for file_path, file_data in baseline.items():
-            f.write(f"{file_path} {file_data['hash']} {file_data['content']}\n")
-    print(f"Baseline created at {baseline_file}")
\ No newline at end of file
+def create_baseline(baseline_file):
+    """Generates a baseline of all files in a directory."""
+    write_baseline(baseline_file, collect())
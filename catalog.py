@@ -0,0 +1,159 @@
+"""
+Script developed by https://github.com/turcanustefan/system-baseline-tool
+This script is licensed under the MIT License.
+You are free to use, modify, and distribute this software as long as
+you include the original copyright notice and license terms.
+This software is provided "as is", without warranty of any kind.
+"""
+import os
+import sqlite3
+import zipfile
+from datetime import datetime
+
+from api import Baseline
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS snapshots (
+    host TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    archive TEXT,
+    PRIMARY KEY (host, timestamp)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    blob_id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    content TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    host TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    category TEXT NOT NULL,
+    path TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    blob_id INTEGER REFERENCES blobs (blob_id)
+);
+CREATE INDEX IF NOT EXISTS entries_path ON entries (path, host, timestamp);
+CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest, host, timestamp);
+'''
+
+
+def archive_snapshot(zip_path, baseline, host=None):
+    """
+    Return the (host, timestamp) of a baseline archive.
+
+    Falls back to `host` (or the archive name) and the newest ZIP member
+    date for archives created before baselines recorded their metadata.
+    """
+    host = baseline.metadata.get('host') or host or os.path.splitext(os.path.basename(zip_path))[0]
+    timestamp = baseline.metadata.get('timestamp')
+    if not timestamp:
+        with zipfile.ZipFile(zip_path, 'r') as zip_obj:
+            date_time = max((info.date_time for info in zip_obj.infolist()), default=None)
+        timestamp = datetime(*date_time).strftime("%Y-%m-%d_%H-%M-%S") if date_time else ''
+    return host, timestamp
+
+
+class Catalog:
+    """A SQLite index of baseline archives for historical drift queries."""
+
+    def __init__(self, catalog_file):
+        self.conn = sqlite3.connect(catalog_file)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _blob_ids(self, records):
+        """Store the content of records once per digest and return digest -> blob_id."""
+        digests = {record.hash: record.content for record in records if record.content}
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO blobs (digest, content) VALUES (?, ?)', digests.items())
+        blob_ids = {}
+        cursor = self.conn.cursor()
+        for digest in digests:
+            row = cursor.execute('SELECT blob_id FROM blobs WHERE digest = ?', (digest,)).fetchone()
+            blob_ids[digest] = row[0]
+        return blob_ids
+
+    def index(self, zip_path, host=None):
+        """
+        Ingest a baseline archive.
+
+        Returns:
+            bool: False if the snapshot of this host and timestamp was already indexed
+        """
+        baseline = Baseline.from_zip(zip_path)
+        host, timestamp = archive_snapshot(zip_path, baseline, host)
+        with self.conn:
+            cursor = self.conn.execute(
+                'INSERT OR IGNORE INTO snapshots (host, timestamp, archive) VALUES (?, ?, ?)',
+                (host, timestamp, os.path.abspath(zip_path)))
+            if not cursor.rowcount:
+                return False
+            for category, records in baseline.categories.items():
+                blob_ids = self._blob_ids(records.values())
+                self.conn.executemany(
+                    'INSERT INTO entries (host, timestamp, category, path, digest, blob_id) VALUES (?, ?, ?, ?, ?, ?)',
+                    ((host, timestamp, category, record.path, record.hash, blob_ids.get(record.hash))
+                     for record in records.values()))
+        return True
+
+    def digest_seen(self, digest):
+        """Return the (first seen, last seen) timestamps of a digest, (None, None) if unknown."""
+        return self.conn.execute(
+            'SELECT MIN(timestamp), MAX(timestamp) FROM entries WHERE digest = ?', (digest,)).fetchone()
+
+    def hosts_with_digest(self, digest, current=True):
+        """
+        Return the hosts having a file with the given digest.
+
+        With `current`, only the latest snapshot of every host is considered.
+        """
+        if not current:
+            rows = self.conn.execute(
+                'SELECT DISTINCT host FROM entries WHERE digest = ? ORDER BY host', (digest,))
+        else:
+            rows = self.conn.execute(
+                '''SELECT DISTINCT e.host FROM entries e
+                   JOIN (SELECT host, MAX(timestamp) AS timestamp FROM snapshots GROUP BY host) latest
+                   ON e.host = latest.host AND e.timestamp = latest.timestamp
+                   WHERE e.digest = ? ORDER BY e.host''', (digest,))
+        return [row[0] for row in rows]
+
+    def content(self, digest):
+        """Return the base64 content stored for a digest, None if only the digest is known."""
+        row = self.conn.execute('SELECT content FROM blobs WHERE digest = ?', (digest,)).fetchone()
+        return row[0] if row else None
+
+    def path_timeline(self, path, host=None):
+        """
+        Return the changes of a path over time.
+
+        Returns:
+            list: (host, timestamp, digest) tuples for every snapshot where the
+            digest of the path differs from the previous snapshot of the same
+            host; digest is None when the path disappeared
+        """
+        query = 'SELECT host, timestamp, digest FROM entries WHERE path = ?'
+        params = [path]
+        if host:
+            query += ' AND host = ?'
+            params.append(host)
+        digests = {(row[0], row[1]): row[2] for row in self.conn.execute(query, params)}
+        if not digests:
+            return []
+
+        query = 'SELECT host, timestamp FROM snapshots'
+        params = []
+        if host:
+            query += ' WHERE host = ?'
+            params.append(host)
+        timeline = []
+        previous = {}
+        for snapshot_host, timestamp in self.conn.execute(query + ' ORDER BY host, timestamp', params):
+            digest = digests.get((snapshot_host, timestamp))
+            if digest != previous.get(snapshot_host):
+                timeline.append((snapshot_host, timestamp, digest))
+                previous[snapshot_host] = digest
+        return timeline
@@ -6,8 +6,8 @@ you include the original copyright notice and license terms.
 This software is provided "as is", without warranty of any kind.
 """
 import os
-import base64
-import hashlib
+from utils import read_content_record, write_baseline
+from journal import cached_record
 
 
 CRON_DIRS = [
@@ -19,6 +19,7 @@ CRON_DIRS = [
     '/etc/cron.monthly/',
     ]
 CRON_FILE = '/etc/crontab'
+BASELINE_FILE = "cron_baseline"
 
 def get_cron_jobs():
     """Returns a list of paths to all cron jobs"""
@@ -32,21 +33,13 @@ def get_cron_jobs():
     return cron_jobs
 
 
+def collect():
+    """Yield a Record for every cron job"""
+    for job_path in get_cron_jobs():
+        if os.path.isfile(job_path):
+            yield cached_record(job_path, read_content_record)
+
+
 def create_baseline(baseline_file):
     """Creates a baseline of all cron jobs"""
-    baseline = {}
-    cron_jobs = get_cron_jobs()
-    for job_path in cron_jobs:
-        if os.path.isfile(job_path):
-            with open(job_path, 'rb') as f:
-                content = f.read()
-                content_b64 = base64.b64encode(content).decode('utf-8')
-                hash_value = hashlib.sha256(content).hexdigest()
-            baseline[job_path] = {
-                'hash': hash_value,
-                'content': content_b64
-            }
-    with open(baseline_file, 'w') as f:
-        for job_path, job_data in baseline.items():
-            f.write(f"{job_path} {job_data['hash']} {job_data['content']}\n")
-    print(f"Baseline created at {baseline_file}")
\ No newline at end of file
+    write_baseline(baseline_file, collect())
@@ -5,44 +5,74 @@ You are free to use, modify, and distribute this software as long as
 you include the original copyright notice and license terms.
 This software is provided "as is", without warranty of any kind.
 """
-import base64
 import os
 import json
-from utils import hash_file, is_binary, is_plain_text
-import hashlib
+from utils import Record, hash_file, is_plain_text, read_content_record, write_baseline
+from journal import cached_record
+from matcher import PathMatcher, walk
 
-def create_baseline(config_file, baseline_file):
-    """Creates a baseline of specified files and folders."""
+
+BASELINE_FILE = "custom_baseline"
+CONFIG_FILE = "config.json"
+
+
+def _record_file(file_path):
+    if is_plain_text(file_path):
+        return read_content_record(file_path)
+    return Record(file_path, hash_file(file_path), None)
+
+
+def record_file(file_path):
+    """Return a content Record for text files, a hash-only Record otherwise."""
+    return cached_record(file_path, _record_file)
+
+
+def read_config(config_file):
+    """Return the parsed config file, None if it does not exist."""
     try:
         with open(config_file, 'r') as f:
-            config = json.load(f)
+            return json.load(f)
     except FileNotFoundError:
         print("Configuration file not found.")
+        return None
+
+
+def read_matcher(config):
+    """Return the PathMatcher of the config options, None if one of its rules is invalid."""
+    try:
+        return PathMatcher.from_options(config.get('options', {}))
+    except ValueError as e:
+        print(e)
+        return None
+
+
+def collect(config_file=CONFIG_FILE):
+    """
+    Yield a Record for every file and folder listed in the config file.
+
+    Folder walks honor the include/exclude rules, max_depth, size filters,
+    include_hidden and include_subfolders from the config `options`; files
+    listed explicitly are always baselined.
+    """
+    config = read_config(config_file)
+    if config is None:
+        return
+    matcher = read_matcher(config)
+    if matcher is None:
         return
 
-    baseline = {}
     files = config.get('files', [])
     folders = config.get('folders', [])
 
-    if not (files or folders):
-        return
-
+    seen = set()
     for file_path in files:
         if os.path.isfile(file_path):
             if os.path.islink(file_path):
                 file_path = os.path.realpath(file_path)
             if os.path.exists(file_path):
-                if is_plain_text(file_path):
-                    with open(file_path, 'rb') as f:
-                        content = f.read()
-                        content_b64 = base64.b64encode(content).decode()
-                        hash_value = hashlib.sha256(content).hexdigest()
-                        baseline[file_path] = {
-                            'hash': hash_value, 
-                            'content': content_b64
-                        }
-                else:
-                    baseline[file_path] = hash_file(file_path)
+                if file_path not in seen:
+                    seen.add(file_path)
+                    yield record_file(file_path)
             else:
                 print(f"File {file_path} does not exist.")
         else:
@@ -50,30 +80,42 @@ def create_baseline(config_file, baseline_file):
 
     for folder in folders:
         if os.path.isdir(folder):
-            for root, _, files in os.walk(folder):
-                for file_name in files:
-                    file_path = os.path.join(root, file_name)
-                    if os.path.islink(file_path):
-                        file_path = os.path.realpath(file_path)
-                    if os.path.exists(file_path):
-                        if is_plain_text(file_path):
-                            with open(file_path, 'rb') as f:
-                                content = f.read()
-                                content_b64 = base64.b64encode(content).decode()
-                                hash_value = hashlib.sha256(content).hexdigest()
-                                baseline[file_path] = {
-                                    'hash': hash_value, 
-                                    'content': content_b64
-                                }
-                        else:
-                            baseline[file_path] = hash_file(file_path)
+            for file_path in walk(folder, matcher):
+                if os.path.islink(file_path):
+                    file_path = os.path.realpath(file_path)
+                if os.path.exists(file_path) and file_path not in seen:
+                    seen.add(file_path)
+                    yield record_file(file_path)
         else:
             print(f"Path {folder} is not a directory.")
 
-    with open(baseline_file, "w") as f:
-        for filepath, fileinfo in baseline.items():
-            if 'content' in fileinfo:
-                f.write(f"{filepath} {fileinfo['hash']} {fileinfo['content']}\n")
-            else:
-                f.write(f"{filepath} {fileinfo}\n")
-    print(f"Baseline created at {baseline_file}")
\ No newline at end of file
+
+def dry_run(config_file=CONFIG_FILE):
+    """
+    Walk the configured folders without reading any file.
+
+    Returns:
+        tuple: (dict of rule -> [files, bytes] removed, [files, bytes] kept)
+    """
+    stats = {}
+    kept = [0, 0]
+    config = read_config(config_file)
+    if config is None:
+        return stats, kept
+    matcher = read_matcher(config)
+    if matcher is None:
+        return stats, kept
+    for folder in config.get('folders', []):
+        if os.path.isdir(folder):
+            for file_path in walk(folder, matcher, stats):
+                kept[0] += 1
+                try:
+                    kept[1] += os.path.getsize(file_path)
+                except OSError:
+                    pass
+    return stats, kept
+
+
+def create_baseline(config_file, baseline_file):
+    """Creates a baseline of specified files and folders."""
+    write_baseline(baseline_file, collect(config_file))
@@ -6,12 +6,26 @@ you include the original copyright notice and license terms.
 This software is provided "as is", without warranty of any kind.
 """
 import os
+import random
+import threading
+
+from utils import Record, hash_file_md5
+from journal import cached_record
+
+
+# Directories merged into /usr on usrmerged systems, dpkg may list either location
+USRMERGE_DIRS = ('/bin/', '/sbin/', '/lib/', '/lib32/', '/lib64/', '/libx32/')
+# Baseline category listing package-owned files whose md5 does not match the package
+MISMATCH_BASELINE_FILE = 'package_mismatch'
+# Seconds a file's ctime may exceed its package's install time and still be trusted
+INSTALL_SLACK = 60
 
 def extract_md5sums(md5sums_dir):
     md5sums = {}
     for file_name in os.listdir(md5sums_dir):
         if file_name.endswith('.md5sums'):
-            package_name = file_name.split('.')[0]
+            # package names contain dots (libboost-atomic1.74.0:amd64), strip only the suffix
+            package_name = os.path.splitext(file_name)[0]
             md5sums[package_name] = {}
             with open(os.path.join(md5sums_dir, file_name), 'r') as f:
                 for line in f:
@@ -20,24 +34,114 @@ def extract_md5sums(md5sums_dir):
                     md5sums[package_name][file_path] = md5
     return md5sums
 
+def format_hashdb(md5sums):
+    """Yield hashdb file lines (without newline) for an md5sums dict."""
+    for package, files in md5sums.items():
+        for file_path, md5sum in files.items():
+            yield f"{package} {file_path} {md5sum}"
+
+def parse_hashdb(lines):
+    """Build an md5sums dict from hashdb file lines."""
+    hashdb = {}
+    for line in lines:
+        parts = line.strip().split()
+        package = parts[0]
+        file_path = parts[1]
+        md5sum = parts[2]
+        if package not in hashdb:
+            hashdb[package] = {}
+        hashdb[package][file_path] = md5sum
+    return hashdb
+
 def save_to_file(md5sums, output_file):
     with open(output_file, 'w') as f:
-        for package, files in md5sums.items():
-            for file_path, md5sum in files.items():
-                f.write(f"{package} {file_path} {md5sum}\n")
+        for line in format_hashdb(md5sums):
+            f.write(line + "\n")
 
 def read_hashdb(hashdb_file):
-    hashdb = {}
     with open(hashdb_file, 'r') as f:
-        for line in f:
-            parts = line.strip().split()
-            package = parts[0]
-            file_path = parts[1]
-            md5sum = parts[2]
-            if package not in hashdb:
-                hashdb[package] = {}
-            hashdb[package][file_path] = md5sum
-    return hashdb
+        return parse_hashdb(f)
+
+def install_times(md5sums_dir):
+    """Return package -> newest mtime of its .md5sums and .list files, keyed like extract_md5sums."""
+    times = {}
+    for file_name in os.listdir(md5sums_dir):
+        if file_name.endswith('.md5sums') or file_name.endswith('.list'):
+            package_name = os.path.splitext(file_name)[0]
+            mtime = os.path.getmtime(os.path.join(md5sums_dir, file_name))
+            times[package_name] = max(times.get(package_name, 0), mtime)
+    return times
+
+def usrmerge_alias(file_path):
+    """Return the other location of a file on a usrmerged system, None if there is none."""
+    for directory in USRMERGE_DIRS:
+        if file_path.startswith('/usr' + directory):
+            return file_path[len('/usr'):]
+        if file_path.startswith(directory):
+            return '/usr' + file_path
+    return None
+
+def _md5_record(file_path):
+    return Record(file_path, hash_file_md5(file_path), None)
+
+class PackageIndex:
+    """
+    Trust files owned by dpkg packages instead of hashing them.
+
+    A package-owned file is only hashed when its ctime is newer than the
+    package's install time, or when it is picked by random sampling. Every
+    other owned file is recorded with the md5 from the package's md5sums.
+    Hashed files whose md5 differs from the package's are collected in
+    `mismatches`. Hashed files are journaled like every other Record, so a
+    resumed create does not hash them again.
+    """
+
+    def __init__(self, md5sums_dir, sample_rate=0.0):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be between 0 and 1, got {sample_rate}")
+        self.md5sums = extract_md5sums(md5sums_dir)
+        self.installed = install_times(md5sums_dir)
+        self.sample_rate = sample_rate
+        self.owners = {}
+        for package, files in self.md5sums.items():
+            for file_path, md5sum in files.items():
+                self.owners[file_path] = (package, md5sum)
+        self.mismatches = []
+        self.trusted = 0
+        self.verified = 0
+        self.lock = threading.Lock()
+
+    def owner(self, file_path):
+        """Return (package, md5) of the package owning a file, None for unowned files."""
+        owner = self.owners.get(file_path)
+        if owner is None:
+            alias = usrmerge_alias(file_path)
+            if alias:
+                owner = self.owners.get(alias)
+        return owner
+
+    def record(self, file_path):
+        """Return the Record of a package-owned file, None for unowned files."""
+        owner = self.owner(file_path)
+        if owner is None:
+            return None
+        package, md5sum = owner
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        changed = st.st_ctime > self.installed.get(package, 0) + INSTALL_SLACK
+        if not changed and random.random() >= self.sample_rate:
+            with self.lock:
+                self.trusted += 1
+            return Record(file_path, md5sum, None)
+
+        record = cached_record(file_path, _md5_record)
+        with self.lock:
+            self.verified += 1
+            if record.hash != md5sum:
+                self.mismatches.append(record)
+        return record
 
 # def main():
 #     md5sums_dir = '/var/lib/dpkg/info'
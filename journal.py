@@ -0,0 +1,136 @@
+"""
+Script developed by https://github.com/turcanustefan/system-baseline-tool
+This script is licensed under the MIT License.
+You are free to use, modify, and distribute this software as long as
+you include the original copyright notice and license terms.
+This software is provided "as is", without warranty of any kind.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils import format_record, parse_record
+
+
+JOURNAL_DIR = '.journal'
+FSYNC_INTERVAL = 5.0  # seconds between fsyncs of the journal
+
+# Journal of the category being collected, consulted by cached_record()
+_active = None
+
+
+def stat_key(file_path):
+    """
+    Return the stat fields that tell whether a file changed since it was journaled.
+
+    The ctime is part of the key because userland can reset the mtime
+    (touch -d, os.utime) after rewriting a file, but not the ctime.
+    """
+    st = os.stat(file_path)
+    return st.st_mtime_ns, st.st_ctime_ns, st.st_size, st.st_dev, st.st_ino
+
+
+# Number of stat_key fields in front of every journal line
+KEY_FIELDS = 5
+
+
+class Journal:
+    """
+    An append-only journal of the Records completed for one category.
+
+    Every line is `<mtime_ns> <ctime_ns> <size> <device> <inode> <baseline line>`,
+    so an interrupted create can reuse a Record as long as the file's stat
+    is unchanged.
+    """
+
+    def __init__(self, journal_file, resume=False):
+        self.entries = {}
+        torn = False
+        if resume and os.path.isfile(journal_file):
+            with open(journal_file, 'r') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        # torn write of an interrupted run
+                        torn = True
+                        continue
+                    self._load(line)
+        self.f = open(journal_file, 'a' if resume else 'w')
+        if torn:
+            # terminate the torn last line before appending to it
+            self.f.write("\n")
+        self.lock = threading.Lock()
+        self.last_sync = time.monotonic()
+        self.reused = 0
+
+    def _load(self, line):
+        parts = line.rstrip('\n').split(' ', KEY_FIELDS)
+        record = parse_record(parts[KEY_FIELDS]) if len(parts) == KEY_FIELDS + 1 else None
+        if record is None:
+            return
+        try:
+            key = tuple(int(part) for part in parts[:KEY_FIELDS])
+        except ValueError:
+            # a line of an older journal format
+            return
+        self.entries[record.path] = (key, record)
+
+    def lookup(self, file_path, key):
+        """Return the journaled Record of a path if its stat is unchanged, None otherwise."""
+        entry = self.entries.get(file_path)
+        if entry and entry[0] == key:
+            with self.lock:
+                self.reused += 1
+            return entry[1]
+        return None
+
+    def append(self, record, key):
+        with self.lock:
+            if self.f.closed:
+                # a scan thread abandoned after a timeout finishing late
+                return
+            self.f.write(f"{' '.join(map(str, key))} {format_record(record)}\n")
+            if time.monotonic() - self.last_sync > FSYNC_INTERVAL:
+                self.sync()
+
+    def sync(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            self.sync()
+            self.f.close()
+
+
+@contextmanager
+def journaling(journal_file, resume=False):
+    """Journal every cached_record() call made while the context is active."""
+    global _active
+    journal = Journal(journal_file, resume)
+    _active = journal
+    try:
+        yield journal
+    finally:
+        _active = None
+        journal.close()
+
+
+def cached_record(file_path, build):
+    """
+    Return build(file_path), unless the active journal already holds a
+    Record for this path with an unchanged stat. New Records are journaled.
+    """
+    journal = _active
+    if journal is None:
+        return build(file_path)
+    try:
+        key = stat_key(file_path)
+    except OSError:
+        return build(file_path)
+    record = journal.lookup(file_path, key)
+    if record is None:
+        record = build(file_path)
+        journal.append(record, key)
+    return record
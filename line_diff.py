@@ -0,0 +1,388 @@
+"""
+Script developed by https://github.com/turcanustefan/system-baseline-tool
+This script is licensed under the MIT License.
+You are free to use, modify, and distribute this software as long as
+you include the original copyright notice and license terms.
+This software is provided "as is", without warranty of any kind.
+"""
+import hashlib
+import html
+import time
+from collections import Counter, namedtuple
+
+
+# context:     unchanged lines shown around every change
+# max_lines:   above this many lines (old + new) only a summary is reported
+# max_seconds: diffs taking longer than this fall back to a summary
+DiffOptions = namedtuple('DiffOptions', ['context', 'max_lines', 'max_seconds'], defaults=(3, 20000, 2.0))
+
+# Regions without unique lines are diffed with Myers only below this size (len(a) * len(b))
+MYERS_MAX_CELLS = 1000000
+
+
+class DiffTimeout(Exception):
+    pass
+
+
+class DiffTooComplex(Exception):
+    """A region without unique lines is too large to diff with Myers."""
+
+
+def to_text(content):
+    """
+    Decode file content to text.
+
+    Returns:
+        str: The decoded content, None if the content is binary or undecodable
+    """
+    if isinstance(content, str):
+        return content
+    if b'\0' in content[:8192]:
+        return None
+    try:
+        return content.decode()
+    except UnicodeDecodeError:
+        return None
+
+
+def _intern(lines, table):
+    """Map lines to integers so that comparisons are int compares."""
+    return [table.setdefault(line, len(table)) for line in lines]
+
+
+def _check(deadline):
+    if deadline is not None and time.monotonic() > deadline:
+        raise DiffTimeout()
+
+
+def _bisect(a, alo, ahi, b, blo, bhi, deadline):
+    """
+    Find the middle snake of a[alo:ahi] and b[blo:bhi] by running Myers'
+    algorithm from both ends at once, in O(len(a) + len(b)) memory.
+
+    Returns:
+        tuple: (i, j) split point of an optimal edit script, None if the ranges share no line
+    """
+    n = ahi - alo
+    m = bhi - blo
+    max_d = (n + m + 1) // 2
+    offset = max_d
+    length = 2 * max_d + 2
+    forward = [-1] * length
+    backward = [-1] * length
+    forward[offset + 1] = 0
+    backward[offset + 1] = 0
+    delta = n - m
+    # with an odd delta the forward search detects the overlap, else the backward one
+    front = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+    for d in range(max_d):
+        _check(deadline)
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            k1_offset = offset + k1
+            if k1 == -d or (k1 != d and forward[k1_offset - 1] < forward[k1_offset + 1]):
+                x1 = forward[k1_offset + 1]
+            else:
+                x1 = forward[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[alo + x1] == b[blo + y1]:
+                x1 += 1
+                y1 += 1
+            forward[k1_offset] = x1
+            if x1 > n:
+                k1end += 2
+            elif y1 > m:
+                k1start += 2
+            elif front:
+                k2_offset = offset + delta - k1
+                if 0 <= k2_offset < length and backward[k2_offset] != -1:
+                    if x1 >= n - backward[k2_offset]:
+                        return alo + x1, blo + y1
+
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            k2_offset = offset + k2
+            if k2 == -d or (k2 != d and backward[k2_offset - 1] < backward[k2_offset + 1]):
+                x2 = backward[k2_offset + 1]
+            else:
+                x2 = backward[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[ahi - 1 - x2] == b[bhi - 1 - y2]:
+                x2 += 1
+                y2 += 1
+            backward[k2_offset] = x2
+            if x2 > n:
+                k2end += 2
+            elif y2 > m:
+                k2start += 2
+            elif not front:
+                k1_offset = offset + delta - k2
+                if 0 <= k1_offset < length and forward[k1_offset] != -1:
+                    x1 = forward[k1_offset]
+                    y1 = offset + x1 - k1_offset
+                    if x1 >= n - x2:
+                        return alo + x1, blo + y1
+    return None
+
+
+def _myers(a, b, alo, ahi, blo, bhi, deadline):
+    """
+    Return the matching blocks of a[alo:ahi] and b[blo:bhi] with the
+    linear-space variant of Myers' O(ND) algorithm: the ranges are split at
+    their middle snake until only common prefixes and suffixes remain.
+    """
+    blocks = []
+    stack = [(alo, ahi, blo, bhi)]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        start = 0
+        while alo + start < ahi and blo + start < bhi and a[alo + start] == b[blo + start]:
+            start += 1
+        if start:
+            blocks.append((alo, blo, start))
+            alo += start
+            blo += start
+        end = 0
+        while alo < ahi - end and blo < bhi - end and a[ahi - end - 1] == b[bhi - end - 1]:
+            end += 1
+        if end:
+            blocks.append((ahi - end, bhi - end, end))
+            ahi -= end
+            bhi -= end
+        if alo == ahi or blo == bhi:
+            continue
+        split = _bisect(a, alo, ahi, b, blo, bhi, deadline)
+        if split is not None:
+            i, j = split
+            stack.append((alo, i, blo, j))
+            stack.append((i, ahi, j, bhi))
+    blocks.sort()
+    return blocks
+
+
+def _unique_anchors(a, b, alo, ahi, blo, bhi):
+    """Return (i, j) pairs of lines unique in both ranges forming the longest increasing sequence."""
+    count_a = Counter(a[alo:ahi])
+    count_b = Counter(b[blo:bhi])
+    index_b = {b[j]: j for j in range(blo, bhi) if count_b[b[j]] == 1}
+    pairs = [(i, index_b[a[i]]) for i in range(alo, ahi) if count_a[a[i]] == 1 and a[i] in index_b]
+    # patience sorting: longest increasing subsequence on j
+    tails = []
+    tails_idx = []
+    prev = [None] * len(pairs)
+    for idx, (_, j) in enumerate(pairs):
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tails[mid] < j:
+                lo = mid + 1
+            else:
+                hi = mid
+        prev[idx] = tails_idx[lo - 1] if lo else None
+        if lo == len(tails):
+            tails.append(j)
+            tails_idx.append(idx)
+        else:
+            tails[lo] = j
+            tails_idx[lo] = idx
+    anchors = []
+    idx = tails_idx[-1] if tails_idx else None
+    while idx is not None:
+        anchors.append(pairs[idx])
+        idx = prev[idx]
+    anchors.reverse()
+    return anchors
+
+
+def matching_blocks(a, b, deadline=None):
+    """
+    Compute the matching blocks of two int sequences with patience diff,
+    falling back to Myers for regions without unique lines.
+
+    Returns:
+        list: (i, j, size) blocks in increasing order
+
+    Raises:
+        DiffTooComplex: A region without unique lines exceeds MYERS_MAX_CELLS
+        DiffTimeout: The deadline passed
+    """
+    blocks = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        _check(deadline)
+        alo, ahi, blo, bhi = stack.pop()
+        # common prefix and suffix
+        start = 0
+        while alo + start < ahi and blo + start < bhi and a[alo + start] == b[blo + start]:
+            start += 1
+        if start:
+            blocks.append((alo, blo, start))
+            alo += start
+            blo += start
+        end = 0
+        while alo < ahi - end and blo < bhi - end and a[ahi - end - 1] == b[bhi - end - 1]:
+            end += 1
+        if end:
+            blocks.append((ahi - end, bhi - end, end))
+            ahi -= end
+            bhi -= end
+        if alo == ahi or blo == bhi:
+            continue
+
+        anchors = _unique_anchors(a, b, alo, ahi, blo, bhi)
+        if anchors:
+            prev_i, prev_j = alo, blo
+            for i, j in anchors:
+                stack.append((prev_i, i, prev_j, j))
+                blocks.append((i, j, 1))
+                prev_i, prev_j = i + 1, j + 1
+            stack.append((prev_i, ahi, prev_j, bhi))
+        elif (ahi - alo) * (bhi - blo) <= MYERS_MAX_CELLS:
+            blocks.extend(_myers(a, b, alo, ahi, blo, bhi, deadline))
+        else:
+            raise DiffTooComplex()
+    blocks.sort()
+    merged = []
+    for i, j, size in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + size)
+        else:
+            merged.append((i, j, size))
+    return merged
+
+
+def get_opcodes(a, b, deadline=None):
+    """Return difflib style (tag, i1, i2, j1, j2) opcodes for two int sequences."""
+    opcodes = []
+    i = j = 0
+    for bi, bj, size in matching_blocks(a, b, deadline) + [(len(a), len(b), 0)]:
+        if i < bi and j < bj:
+            opcodes.append(('replace', i, bi, j, bj))
+        elif i < bi:
+            opcodes.append(('delete', i, bi, j, bj))
+        elif j < bj:
+            opcodes.append(('insert', i, bi, j, bj))
+        if size:
+            opcodes.append(('equal', bi, bi + size, bj, bj + size))
+        i, j = bi + size, bj + size
+    return opcodes
+
+
+def group_opcodes(opcodes, context):
+    """Split opcodes into hunks with at most `context` equal lines around each change."""
+    if not opcodes:
+        return []
+    codes = list(opcodes)
+    if codes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    if codes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+
+    groups = []
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == 'equal' and i2 - i1 > context * 2:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            groups.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        groups.append(group)
+    return [g for g in groups if any(code[0] != 'equal' for code in g)]
+
+
+def _summary(message):
+    return f'<p>{html.escape(message)}</p>'
+
+
+def _digest_summary(old, new, old_lines, new_lines, reason):
+    """Summarize a text change by line counts when no full diff is rendered."""
+    old_count = Counter(old_lines)
+    new_count = Counter(new_lines)
+    added = sum((new_count - old_count).values())
+    removed = sum((old_count - new_count).values())
+    return _summary(f"{reason}: {_digest(old)} -> {_digest(new)}, {added} lines added, {removed} lines removed")
+
+
+def _digest(content):
+    if content is None:
+        return "none"
+    if isinstance(content, str):
+        content = content.encode()
+    return hashlib.sha256(content).hexdigest()
+
+
+def _label(content):
+    """Return a recorded digest as is, the digest of captured content otherwise."""
+    if isinstance(content, str):
+        return content
+    return _digest(content)
+
+
+def render_hunks(old_lines, new_lines, groups):
+    """Render grouped opcodes as unified diff style HTML."""
+    out = ['<pre>']
+    for group in groups:
+        i1, i2 = group[0][1], group[-1][2]
+        j1, j2 = group[0][3], group[-1][4]
+        out.append(f'<b>@@ -{i1 + 1},{i2 - i1} +{j1 + 1},{j2 - j1} @@</b>\n')
+        for tag, a1, a2, b1, b2 in group:
+            if tag == 'equal':
+                for line in old_lines[a1:a2]:
+                    out.append(f' {html.escape(line)}\n')
+                continue
+            for line in old_lines[a1:a2]:
+                out.append(f'<span style="background:#fbb">-{html.escape(line)}</span>\n')
+            for line in new_lines[b1:b2]:
+                out.append(f'<span style="background:#bfb">+{html.escape(line)}</span>\n')
+    out.append('</pre>')
+    return ''.join(out)
+
+
+def diff_html(old, new, options=None):
+    """
+    Render the difference between two file contents as HTML.
+
+    Args:
+        old (bytes|str|None): Old content; a str is treated as a digest-only entry
+        new (bytes|str|None): New content; a str is treated as a digest-only entry
+        options (DiffOptions): Context and size/time limits
+
+    Returns:
+        str: Context-limited hunks, or a one line summary for hash-only,
+        binary, undecodable, oversized or slow diffs
+    """
+    options = options or DiffOptions()
+    if isinstance(old, str) or isinstance(new, str):
+        # only digests were recorded for this file
+        return _summary(f"digest: {_label(old)} -> {_label(new)}")
+
+    old_text = to_text(old) if old is not None else ''
+    new_text = to_text(new) if new is not None else ''
+    if old_text is None or new_text is None:
+        old_size = len(old) if old is not None else 0
+        new_size = len(new) if new is not None else 0
+        return _summary(f"binary content: {_digest(old)} -> {_digest(new)}, {old_size} -> {new_size} bytes")
+
+    old_lines = old_text.splitlines()
+    new_lines = new_text.splitlines()
+    if len(old_lines) + len(new_lines) > options.max_lines:
+        return _digest_summary(old, new, old_lines, new_lines, "digest changed")
+
+    table = {}
+    a = _intern(old_lines, table)
+    b = _intern(new_lines, table)
+    deadline = time.monotonic() + options.max_seconds if options.max_seconds else None
+    try:
+        opcodes = get_opcodes(a, b, deadline)
+    except DiffTimeout:
+        return _digest_summary(old, new, old_lines, new_lines, "digest changed (diff timed out)")
+    except DiffTooComplex:
+        return _digest_summary(old, new, old_lines, new_lines, "digest changed (diff too complex)")
+    hunks = group_opcodes(opcodes, options.context)
+    if not hunks and old != new:
+        # splitlines() hides changed line endings and a changed final newline
+        return _digest_summary(old, new, old_lines, new_lines, "digest changed (line endings/whitespace only)")
+    return render_hunks(old_lines, new_lines, hunks)
@@ -0,0 +1,184 @@
+"""
+Script developed by https://github.com/turcanustefan/system-baseline-tool
+This script is licensed under the MIT License.
+You are free to use, modify, and distribute this software as long as
+you include the original copyright notice and license terms.
+This software is provided "as is", without warranty of any kind.
+"""
+import fnmatch
+import os
+import re
+
+
+REGEX_PREFIX = 're:'
+
+
+def _compile(patterns, kind):
+    """
+    Compile glob and regex patterns of the `kind` rules (include or exclude).
+
+    Globs without a '/' are compiled into one alternation matched against the
+    file name and globs with a '/' into one matched against the full path; the
+    named group of a match tells which glob matched. Patterns prefixed with
+    're:' are regular expressions searched in the full path. They are compiled
+    one by one, so inline flags and backreferences keep working.
+
+    Returns:
+        tuple: (name regex, path regex, dict of group name -> pattern, list of (regex, pattern)),
+        the alternations are None when empty
+
+    Raises:
+        ValueError: If a 're:' pattern is not a valid regular expression
+    """
+    name_parts = []
+    path_parts = []
+    groups = {}
+    regex_rules = []
+    for i, pattern in enumerate(patterns):
+        group = f'r{i}'
+        if pattern.startswith(REGEX_PREFIX):
+            try:
+                regex_rules.append((re.compile(pattern[len(REGEX_PREFIX):]), pattern))
+            except re.error as e:
+                raise ValueError(f"Invalid {kind} rule {pattern!r}: {e}") from e
+            continue
+        groups[group] = pattern
+        if '/' in pattern:
+            path_parts.append(f'(?P<{group}>{fnmatch.translate(pattern)})')
+        else:
+            name_parts.append(f'(?P<{group}>{fnmatch.translate(pattern)})')
+    name_regex = re.compile('|'.join(name_parts)) if name_parts else None
+    path_regex = re.compile('|'.join(path_parts)) if path_parts else None
+    return name_regex, path_regex, groups, regex_rules
+
+
+class PathMatcher:
+    """
+    The include/exclude rules of the custom baseline compiled into one matcher.
+
+    prune_dir() and skip_file() return the rule that removes a directory or
+    file (e.g. 'exclude:node_modules', 'hidden', 'max_depth'), None if it is kept.
+    An invalid 're:' rule raises a ValueError naming the rule.
+    """
+
+    def __init__(self, include=(), exclude=(), include_hidden=True, max_depth=None, min_size=None, max_size=None):
+        self.include_name, self.include_path, self.include_groups, self.include_regexes = _compile(include, 'include')
+        self.exclude_name, self.exclude_path, self.exclude_groups, self.exclude_regexes = _compile(exclude, 'exclude')
+        self.has_include = bool(include)
+        self.include_hidden = include_hidden
+        self.max_depth = max_depth
+        self.min_size = min_size
+        self.max_size = max_size
+
+    @classmethod
+    def from_options(cls, options):
+        """Build a matcher from the `options` section of config.json."""
+        max_depth = options.get('max_depth')
+        if not options.get('include_subfolders', True):
+            max_depth = 0
+        return cls(
+            include=options.get('include', []),
+            exclude=options.get('exclude', []),
+            include_hidden=options.get('include_hidden', True),
+            max_depth=max_depth,
+            min_size=options.get('min_size'),
+            max_size=options.get('max_size'),
+        )
+
+    def _exclude_rule(self, path, name):
+        for regex, target in ((self.exclude_name, name), (self.exclude_path, path)):
+            if regex:
+                match = regex.match(target)
+                if match:
+                    return 'exclude:' + self.exclude_groups[match.lastgroup]
+        for regex, pattern in self.exclude_regexes:
+            if regex.search(path):
+                return 'exclude:' + pattern
+        return None
+
+    def _included(self, path, name):
+        for regex, target in ((self.include_name, name), (self.include_path, path)):
+            if regex and regex.match(target):
+                return True
+        return any(regex.search(path) for regex, _ in self.include_regexes)
+
+    def prune_dir(self, path, name, depth):
+        """Return the rule pruning a directory at `depth` below the walked folder (its files are at depth + 1)."""
+        if not self.include_hidden and name.startswith('.'):
+            return 'hidden'
+        if self.max_depth is not None and depth >= self.max_depth:
+            return 'max_depth'
+        return self._exclude_rule(path, name)
+
+    def skip_file(self, path, name, size=None):
+        """Return the rule removing a file. `size` is only needed when size filters are set."""
+        if not self.include_hidden and name.startswith('.'):
+            return 'hidden'
+        rule = self._exclude_rule(path, name)
+        if rule:
+            return rule
+        if self.has_include and not self._included(path, name):
+            return 'include'
+        if self.min_size is not None and size < self.min_size:
+            return 'min_size'
+        if self.max_size is not None and size > self.max_size:
+            return 'max_size'
+        return None
+
+    @property
+    def needs_size(self):
+        return self.min_size is not None or self.max_size is not None
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _count_tree(folder):
+    """Return (files, bytes) below a folder."""
+    files = 0
+    size = 0
+    for root, _, file_names in os.walk(folder):
+        for file_name in file_names:
+            files += 1
+            size += _file_size(os.path.join(root, file_name))
+    return files, size
+
+
+def walk(folder, matcher, stats=None):
+    """
+    Yield the paths of the files below a folder kept by the matcher. Pruned
+    directories are not descended into.
+
+    With a `stats` dict, the files and bytes removed by every rule are counted
+    into stats[rule] = [files, bytes], walking pruned directories to count them.
+    """
+    for root, dirs, files in os.walk(folder):
+        rel = os.path.relpath(root, folder)
+        depth = 0 if rel == '.' else rel.count(os.sep) + 1
+        kept_dirs = []
+        for dir_name in dirs:
+            dir_path = os.path.join(root, dir_name)
+            rule = matcher.prune_dir(dir_path, dir_name, depth)
+            if rule is None:
+                kept_dirs.append(dir_name)
+            elif stats is not None:
+                files_removed, bytes_removed = _count_tree(dir_path)
+                counts = stats.setdefault(rule, [0, 0])
+                counts[0] += files_removed
+                counts[1] += bytes_removed
+        dirs[:] = kept_dirs
+
+        for file_name in files:
+            file_path = os.path.join(root, file_name)
+            size = _file_size(file_path) if matcher.needs_size or stats is not None else None
+            rule = matcher.skip_file(file_path, file_name, size)
+            if rule is None:
+                yield file_path
+            elif stats is not None:
+                counts = stats.setdefault(rule, [0, 0])
+                counts[0] += 1
+                counts[1] += size
@@ -0,0 +1,140 @@
+"""
+Script developed by https://github.com/turcanustefan/system-baseline-tool
+This script is licensed under the MIT License.
+You are free to use, modify, and distribute this software as long as
+you include the original copyright notice and license terms.
+This software is provided "as is", without warranty of any kind.
+"""
+import queue
+import threading
+import time
+
+
+PIPELINE_QUEUE_SIZE = 1024
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class _Error:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class StageQueue:
+    """
+    A bounded queue between two pipeline stages that records its depth and
+    the time producers spent blocked on a full queue and consumers spent
+    waiting on an empty one.
+    """
+
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.maxsize = maxsize
+        self.queue = queue.Queue(maxsize)
+        self.lock = threading.Lock()
+        self.samples = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self.put_wait = 0.0
+        self.get_wait = 0.0
+
+    def put(self, item, stop):
+        """Put an item, blocking while the queue is full. Returns False if the pipeline stopped."""
+        start = time.monotonic()
+        while True:
+            try:
+                self.queue.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                if stop.is_set():
+                    return False
+        with self.lock:
+            self.put_wait += time.monotonic() - start
+        return True
+
+    def get(self, stop):
+        """Get an item, blocking while the queue is empty. Returns _DONE if the pipeline stopped."""
+        start = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if stop.is_set():
+                    return _DONE
+        depth = self.queue.qsize()
+        with self.lock:
+            self.get_wait += time.monotonic() - start
+            self.samples += 1
+            self.depth_total += depth
+            self.max_depth = max(self.max_depth, depth)
+        return item
+
+    def summary(self):
+        average = self.depth_total / self.samples if self.samples else 0
+        return (f"{self.name}: average depth {average:.0f}/{self.maxsize}, max {self.max_depth}, "
+                f"producers blocked {self.put_wait:.2f}s, consumers waited {self.get_wait:.2f}s")
+
+
+def run(source, work, workers=4, queue_size=PIPELINE_QUEUE_SIZE, stats=None):
+    """
+    Run a walk -> work -> write pipeline and yield the results of work().
+
+    One thread iterates `source` into a bounded queue, `workers` threads
+    apply `work` to its items into a second bounded queue, and the caller
+    consumes the results as they complete. Full queues block the stage
+    feeding them, which caps memory at about 2 * queue_size items.
+
+    Results are yielded in completion order. An exception raised by the
+    source or by work() is re-raised in the caller. The StageQueues are
+    appended to `stats` for reporting.
+    """
+    stop = threading.Event()
+    items = StageQueue('walk -> hash', queue_size)
+    results = StageQueue('hash -> write', queue_size)
+    if stats is not None:
+        stats.extend([items, results])
+
+    def walker():
+        try:
+            for item in source:
+                if not items.put(item, stop):
+                    return
+        except Exception as e:
+            results.put(_Error(e), stop)
+        finally:
+            for _ in range(workers):
+                items.put(_DONE, stop)
+
+    def worker():
+        while True:
+            item = items.get(stop)
+            if item is _DONE:
+                results.put(_DONE, stop)
+                return
+            try:
+                result = work(item)
+            except Exception as e:
+                result = _Error(e)
+            if not results.put(result, stop):
+                return
+
+    threads = [threading.Thread(target=walker, daemon=True)]
+    threads += [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    done = 0
+    try:
+        while done < workers:
+            result = results.get(stop)
+            if result is _DONE:
+                done += 1
+            elif isinstance(result, _Error):
+                raise result.exc
+            else:
+                yield result
+    finally:
+        # unblock the other stages if the caller stopped early or an error was raised
+        stop.set()
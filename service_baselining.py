@@ -6,8 +6,8 @@ you include the original copyright notice and license terms.
 This software is provided "as is", without warranty of any kind.
 """
 import os
-import hashlib
-import base64
+from utils import read_content_record, write_baseline
+from journal import cached_record
 
 
 SERVICE_DIRS = [
@@ -16,28 +16,19 @@ SERVICE_DIRS = [
     '/lib/systemd/user/',
     '/etc/systemd/user/'
 ]
+BASELINE_FILE = "service_baseline"
 
-def create_baseline(baseline_file):
-    """Generates a baseline of services on the host."""
-    baseline = {}
-
-    # Baseline common SERVICE_DIRS directories
+def collect():
+    """Yield a Record for every service unit on the host."""
     for directory in SERVICE_DIRS:
         for root, dirs, files in os.walk(directory):
             for filename in files:
                 if filename.endswith('.service'):
                     path = os.path.join(root, filename)
                     if os.path.isfile(path):
-                        with open(path, 'rb') as f:
-                            content = f.read()
-                            content_b64 = base64.b64encode(content).decode()
-                            hash_value = hashlib.sha256(content).hexdigest()
-                            baseline[path] = {
-                                'hash': hash_value, 
-                                'content': content_b64
-                            }
-    # Write baseline to file
-    with open(baseline_file, 'w') as f:
-        for file_path, file_data in baseline.items():
-            f.write(f"{file_path} {file_data['hash']} {file_data['content']}\n")
-    print(f"Baseline created at {baseline_file}")
\ No newline at end of file
+                        yield cached_record(path, read_content_record)
+
+
+def create_baseline(baseline_file):
+    """Generates a baseline of services on the host."""
+    write_baseline(baseline_file, collect())
@@ -0,0 +1,81 @@
+"""
+Script developed by https://github.com/turcanustefan/system-baseline-tool
+This script is licensed under the MIT License.
+You are free to use, modify, and distribute this software as long as
+you include the original copyright notice and license terms.
+This software is provided "as is", without warranty of any kind.
+"""
+import random
+
+import line_diff
+
+
+def _random_pair(rng):
+    a = [rng.randint(0, rng.choice([3, 10, 50])) for _ in range(rng.randint(0, 40))]
+    b = list(a)
+    for _ in range(rng.randint(0, 10)):
+        op = rng.random()
+        if op < 0.3 and b:
+            del b[rng.randrange(len(b))]
+        elif op < 0.6:
+            b.insert(rng.randint(0, len(b)), rng.randint(0, 60))
+        elif b:
+            b[rng.randrange(len(b))] = rng.randint(0, 60)
+    return a, b
+
+
+def _lcs_length(a, b):
+    row = [0] * (len(b) + 1)
+    for x in a:
+        prev = 0
+        for j, y in enumerate(b):
+            prev, row[j + 1] = row[j + 1], prev + 1 if x == y else max(row[j + 1], row[j])
+    return row[-1]
+
+
+def test_opcodes_round_trip():
+    rng = random.Random(1)
+    for _ in range(2000):
+        a, b = _random_pair(rng)
+        rebuilt = []
+        i = j = 0
+        for tag, i1, i2, j1, j2 in line_diff.get_opcodes(a, b):
+            assert (i1, j1) == (i, j)
+            if tag == 'equal':
+                assert a[i1:i2] == b[j1:j2]
+            rebuilt.extend(b[j1:j2])
+            i, j = i2, j2
+        assert (i, j) == (len(a), len(b))
+        assert rebuilt == b
+
+
+def test_myers_is_optimal():
+    rng = random.Random(2)
+    for _ in range(2000):
+        a, b = _random_pair(rng)
+        blocks = line_diff._myers(a, b, 0, len(a), 0, len(b), None)
+        for i, j, size in blocks:
+            assert a[i:i + size] == b[j:j + size]
+        assert sum(size for _, _, size in blocks) == _lcs_length(a, b)
+
+
+def test_large_region_without_unique_lines_is_summarized():
+    old = '\n'.join(['x', 'y'] * 5000).encode()
+    new = '\n'.join(['y', 'z', 'z'] * 3000).encode()
+    report = line_diff.diff_html(old, new)
+    assert report.startswith('<p>digest changed (diff too complex)')
+
+
+def test_hunks_and_summaries():
+    report = line_diff.diff_html(b'a\nb\nc\nd\n', b'a\nb\nX\nd\n', line_diff.DiffOptions(context=1))
+    assert '@@ -2,3 +2,3 @@' in report
+    assert '-c' in report and '+X' in report
+    assert line_diff.diff_html(b'\x00\x01', b'\xff').startswith('<p>binary content')
+    many = '\n'.join(str(i) for i in range(30)).encode()
+    assert line_diff.diff_html(many, b'', line_diff.DiffOptions(max_lines=10)).startswith('<p>digest changed')
+
+
+def test_line_ending_only_change_is_summarized():
+    report = line_diff.diff_html(b'a\r\nb', b'a\nb')
+    assert report.startswith('<p>digest changed (line endings/whitespace only)')
+    assert line_diff.diff_html(b'a\nb', b'a\nb\n').startswith('<p>digest changed (line endings')
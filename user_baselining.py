@@ -6,9 +6,16 @@ you include the original copyright notice and license terms.
 This software is provided "as is", without warranty of any kind.
 """
 import os
-import hashlib
-import base64
 import pwd
+import queue
+import threading
+import time
+from collections import namedtuple
+from utils import read_content_record, write_baseline
+from journal import cached_record
+
+
+BASELINE_FILE = "user_baseline"
 
 
 # list of common directories
@@ -44,55 +51,216 @@ USER_FILES = [
     '.ssh/authorized_keys',
 ]
 
-def create_baseline(baseline_file):
-    """Generates a baseline of user files and configs for specified users."""
-    baseline = {}
+# Home directory scanning
+HOME_SCAN_WORKERS = 16
+HOME_SCAN_TIMEOUT = 10  # seconds a single home may take before its mount is given up
+NETWORK_SCAN_WORKERS = 4
+# 'scan': scan network homes with the local ones, 'separate': scan them in their own
+# smaller pool so a slow server cannot starve local homes, 'skip': do not scan them
+NETWORK_HOMES = 'separate'
+NETWORK_FS_TYPES = {
+    'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'autofs', 'afs', 'ceph', 'glusterfs',
+    'lustre', 'gpfs', 'fuse.sshfs', 'fuse.glusterfs', 'fuse.ceph', '9p',
+}
+
+# Outcome of scanning the homes of all users. `timed_out` and `skipped` map a home
+# directory to the users that live in it.
+HomeScan = namedtuple('HomeScan', ['records', 'timed_out', 'skipped'])
+
+
+def get_mounts(mounts_file='/proc/self/mounts'):
+    """Return (mount point, fs type) pairs, longest mount point first."""
+    mounts = []
+    try:
+        with open(mounts_file, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3:
+                    mount_point = parts[1].replace('\\040', ' ')
+                    mounts.append((mount_point, parts[2]))
+    except OSError:
+        pass
+    mounts.sort(key=lambda mount: len(mount[0]), reverse=True)
+    return mounts
+
+
+def mount_of(path, mounts):
+    """Return the (mount point, fs type) a path lives on, without touching the filesystem."""
+    for mount_point, fs_type in mounts:
+        if path == mount_point or path.startswith(mount_point.rstrip('/') + '/'):
+            return mount_point, fs_type
+    return '/', None
+
+
+def scan_home(home):
+    """Return the Records of the USER_FILES present in a home directory."""
+    records = []
+    if os.path.isdir(home):
+        for file_path in USER_FILES:
+            full_file_path = os.path.join(home, file_path)
+            if os.path.isfile(full_file_path):
+                records.append(cached_record(full_file_path, read_content_record))
+    return records
+
+
+def _scan_pool(homes, mounts, workers, timeout):
+    """
+    Scan homes in `workers` daemon threads.
+
+    A home that takes longer than `timeout` is abandoned; on a network
+    filesystem every other home on the same mount is abandoned with it, since
+    an unresponsive server hangs them all. A slow home on a local filesystem
+    only gives up that home. The thread is left behind (a hung NFS read
+    cannot be interrupted) and replaced, so the pool keeps its parallelism.
+
+    Returns:
+        tuple: (dict of home -> Records, set of timed out homes)
+    """
+    tasks = queue.Queue()
+    for home in homes:
+        tasks.put(home)
+    events = queue.Queue()
+    hung_mounts = set()
+    seen_inodes = set()
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                home = tasks.get_nowait()
+            except queue.Empty:
+                return
+            if mount_of(home, mounts)[0] in hung_mounts:
+                events.put(('hung', home, None))
+                continue
+            events.put(('start', home, time.monotonic()))
+            try:
+                st = os.stat(home)
+                with lock:
+                    # the same home reached through another path (bind mount, symlink)
+                    duplicate = (st.st_dev, st.st_ino) in seen_inodes
+                    seen_inodes.add((st.st_dev, st.st_ino))
+                records = [] if duplicate else scan_home(home)
+            except OSError:
+                records = []
+            events.put(('done', home, records))
+
+    def start_worker():
+        threading.Thread(target=worker, daemon=True).start()
+
+    for _ in range(min(workers, len(homes))):
+        start_worker()
+
+    results = {}
+    timed_out = set()
+    started = {}
+    while len(results) + len(timed_out) < len(homes):
+        try:
+            kind, home, value = events.get(timeout=0.1)
+        except queue.Empty:
+            kind = None
+        if kind == 'start':
+            started[home] = value
+        elif kind == 'done':
+            started.pop(home, None)
+            if home not in timed_out:
+                results[home] = value
+        elif kind == 'hung':
+            timed_out.add(home)
+        now = time.monotonic()
+        for home, start in list(started.items()):
+            if now - start > timeout:
+                del started[home]
+                timed_out.add(home)
+                mount_point, fs_type = mount_of(home, mounts)
+                if fs_type in NETWORK_FS_TYPES:
+                    hung_mounts.add(mount_point)
+                start_worker()
+    return results, timed_out
+
+
+def scan_homes(users, workers=HOME_SCAN_WORKERS, timeout=HOME_SCAN_TIMEOUT, network_homes=NETWORK_HOMES):
+    """
+    Concurrently scan the home directories of the given pwd entries.
+
+    Homes shared by several users are scanned once. Homes on network
+    filesystems are scanned with the local ones, in a separate pool or
+    skipped, depending on `network_homes`.
+
+    Returns:
+        HomeScan: The Records in user order, and the timed out and skipped homes
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    homes = {}
+    for user in users:
+        if user.pw_dir:
+            homes.setdefault(os.path.normpath(user.pw_dir), []).append(user.pw_name)
+
+    mounts = get_mounts()
+    local_homes = []
+    network_queue = []
+    skipped = {}
+    for home, names in homes.items():
+        if mount_of(home, mounts)[1] not in NETWORK_FS_TYPES or network_homes == 'scan':
+            local_homes.append(home)
+        elif network_homes == 'skip':
+            skipped[home] = names
+        else:
+            network_queue.append(home)
+
+    results = {}
+    timed_out = set()
+    pools = [(local_homes, workers), (network_queue, NETWORK_SCAN_WORKERS)]
+    threads = []
+    for pool_homes, pool_workers in pools:
+        def run(pool_homes=pool_homes, pool_workers=pool_workers):
+            pool_results, pool_timed_out = _scan_pool(pool_homes, mounts, pool_workers, timeout)
+            results.update(pool_results)
+            timed_out.update(pool_timed_out)
+        thread = threading.Thread(target=run)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    records = [record for home in homes for record in results.get(home, [])]
+    return HomeScan(records, {home: homes[home] for home in homes if home in timed_out}, skipped)
+
+
+def collect(workers=HOME_SCAN_WORKERS, timeout=HOME_SCAN_TIMEOUT, network_homes=NETWORK_HOMES):
+    """Yield a Record for every user file and config on the host."""
+    # Paths already yielded, e.g. /etc/pam.d/ files also listed in COMMON_USER_FILES
+    # or homes shared by several users
+    seen = set()
 
     # Baseline common user directories
     for directory in COMMON_USER_DIRS:
         for root, dirs, files in os.walk(directory):
             for filename in files:
                 path = os.path.join(root, filename)
-                with open(path, 'rb') as f:
-                    content = f.read()
-                    content_b64 = base64.b64encode(content).decode()
-                    hash_value = hashlib.sha256(content).hexdigest()
-                    baseline[path] = {
-                        'hash': hash_value, 
-                        'content': content_b64
-                    }
+                seen.add(path)
+                yield cached_record(path, read_content_record)
 
     # Baseline common user files and configs
     for file_path in COMMON_USER_FILES:
-        if os.path.isfile(file_path):
-            with open(file_path, 'rb') as f:
-                content = f.read()
-                content_b64 = base64.b64encode(content).decode()
-                hash_value = hashlib.sha256(content).hexdigest()
-                baseline[file_path] = {
-                    'hash': hash_value,
-                    'content': content_b64
-                }
+        if file_path not in seen and os.path.isfile(file_path):
+            seen.add(file_path)
+            yield cached_record(file_path, read_content_record)
 
     # Baseline per-user files and configs
-    users = pwd.getpwall()
-    for user in users:
-        user_home_dir = user.pw_dir
-        if os.path.isdir(user_home_dir):
-            for file_path in USER_FILES:
-                full_file_path = os.path.join(user_home_dir, file_path)
-                if os.path.isfile(full_file_path):
-                    with open(full_file_path, 'rb') as f:
-                        content = f.read()
-                        content_b64 = base64.b64encode(content).decode()
-                        hash_value = hashlib.sha256(content).hexdigest()
-                        baseline[full_file_path] = {
-                            'hash': hash_value,
-                            'content': content_b64
-                        }
-    # Write baseline to file
-    with open(baseline_file, 'w') as f:
-        for file_path, file_data in baseline.items():
-            f.write(f"{file_path} {file_data['hash']} {file_data['content']}\n")
-
-    print(f"Baseline created at {baseline_file}")
+    scan = scan_homes(pwd.getpwall(), workers, timeout, network_homes)
+    for record in scan.records:
+        if record.path not in seen:
+            seen.add(record.path)
+            yield record
+
+    for home, names in scan.timed_out.items():
+        print(f"Timed out scanning {home} (users: {', '.join(names)})")
+    for home, names in scan.skipped.items():
+        print(f"Skipped network home {home} (users: {', '.join(names)})")
+
+
+def create_baseline(baseline_file):
+    """Generates a baseline of user files and configs for specified users."""
+    write_baseline(baseline_file, collect())
@@ -7,11 +7,21 @@ This software is provided "as is", without warranty of any kind.
 """
 import hashlib
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 import base64
-import difflib
 import importlib.util
+from collections import namedtuple
 import magic
+from line_diff import diff_html
+
+
+# A single baselined file. `content` is the base64 encoded file content for
+# categories that capture it, None for hash-only entries.
+Record = namedtuple('Record', ['path', 'hash', 'content'])
+
+# A single difference between two baselines. `kind` is one of 'added',
+# 'removed' or 'changed'; `old`/`new` are the Records on either side.
+Change = namedtuple('Change', ['category', 'kind', 'path', 'old', 'new'])
 
 def is_plain_text(file_path):
     try:
@@ -91,14 +101,17 @@ def create_dir(directory):
         os.makedirs(directory)
 
 
-def generate_timestamp():
+def generate_timestamp(utc=False):
     """
     Generate a timestamp string.
 
+    Args:
+        utc (bool): Use UTC instead of the local time, for timestamps compared across hosts
+
     Returns:
         str: The timestamp string
     """
-    now = datetime.now()
+    now = datetime.now(timezone.utc) if utc else datetime.now()
     return now.strftime("%Y-%m-%d_%H-%M-%S")
 
 
@@ -122,93 +135,148 @@ def is_hash_in_hashdb2(md5sums, file_path, target_hash):
     return False    
 
 
-def compare_baselines_content(old_baseline_file, new_baseline_file, report):
-    """Compares two baseline files to identify added, removed, and changed files."""
-    old_baseline = {}
-    with open(old_baseline_file, 'r') as f:
-        for line in f:
-            try:
-                file_path, file_hash, file_content_b64 = line.strip().split(' ')
-                if file_path.endswith('bdx'):
-                    print(file_path, file_hash, file_content)
-                if file_content_b64:
-                    file_content = base64.b64decode(file_content_b64.encode()).decode()
-                else:
-                    file_content = None
-                old_baseline[file_path] = {'hash': file_hash, 'content': file_content}
-            except:
-                continue
-
-    new_baseline = {}
-    with open(new_baseline_file, 'r') as f:
-        for line in f:
-            try:
-                file_path, file_hash, file_content_b64 = line.strip().split(' ')
-                if file_content_b64:
-                    file_content = base64.b64decode(file_content_b64.encode()).decode()
-                else:
-                    file_content = None
-                new_baseline[file_path] = {'hash': file_hash, 'content': file_content}
-            except:
-                continue
+def content_record(file_path, content):
+    """
+    Build a Record that captures the full content of a file.
+
+    Args:
+        file_path (str): Path to the file
+        content (bytes): Raw file content
+
+    Returns:
+        Record: The record holding the SHA256 hash and base64 content
+    """
+    return Record(file_path, hashlib.sha256(content).hexdigest(), base64.b64encode(content).decode())
+
+
+def read_content_record(file_path):
+    """Read a file from disk and return its content Record."""
+    with open(file_path, 'rb') as f:
+        return content_record(file_path, f.read())
+
+
+def format_record(record):
+    """Serialize a Record to a baseline file line (without newline)."""
+    if record.content is None:
+        return f"{record.path} {record.hash}"
+    return f"{record.path} {record.hash} {record.content}"
+
+
+def parse_record(line):
+    """Parse a baseline file line into a Record, None if the line is malformed."""
+    parts = line.strip().split(' ')
+    if len(parts) == 2:
+        return Record(parts[0], parts[1], None)
+    if len(parts) == 3:
+        return Record(parts[0], parts[1], parts[2] or None)
+    return None
 
+
+def iter_records(lines):
+    """Lazily parse baseline file lines into Records, skipping malformed ones."""
+    for line in lines:
+        record = parse_record(line)
+        if record is not None:
+            yield record
+
+
+def write_baseline(baseline_file, records):
+    """Write an iterable of Records to a baseline file."""
+    with open(baseline_file, 'w') as f:
+        for record in records:
+            f.write(format_record(record) + "\n")
+    print(f"Baseline created at {baseline_file}")
+
+
+def read_baseline(baseline_file):
+    """Read a baseline file into a dict of path -> Record."""
+    with open(baseline_file, 'r') as f:
+        return {record.path: record for record in iter_records(f)}
+
+
+def diff_records(old_records, new_records, category=None):
+    """
+    Compare two dicts of path -> Record.
+
+    Args:
+        old_records (dict): Records of the old system state
+        new_records (dict): Records of the new system state
+        category (str): Category name stored on every Change
+
+    Yields:
+        Change: Added and changed files in new baseline order, then removed files
+    """
+    for file_path, new_record in new_records.items():
+        old_record = old_records.get(file_path)
+        if not old_record:
+            yield Change(category, 'added', file_path, None, new_record)
+        elif old_record.hash != new_record.hash:
+            yield Change(category, 'changed', file_path, old_record, new_record)
+    for file_path, old_record in old_records.items():
+        if file_path not in new_records:
+            yield Change(category, 'removed', file_path, old_record, None)
+
+
+def report_content(record):
+    """Return the raw content of a Record for reporting, its hash if no content was captured."""
+    if record.content:
+        try:
+            return base64.b64decode(record.content.encode())
+        except ValueError:
+            pass
+    return record.hash
+
+
+def generate_content_report(changes, options=None):
+    """Generates an HTML report for the Changes of a content baseline."""
     added_files = {}
     removed_files = {}
     changed_files = {}
+    for change in changes:
+        if change.kind == 'added':
+            added_files[change.path] = (None, report_content(change.new))
+        elif change.kind == 'removed':
+            removed_files[change.path] = (report_content(change.old), None)
+        else:
+            changed_files[change.path] = (report_content(change.old), report_content(change.new))
+    return generate_report(added_files, removed_files, changed_files, options)
 
-    # Identify added and changed files
-    for file_path, new_file_data in new_baseline.items():
-        old_file_data = old_baseline.get(file_path)
-        if not old_file_data:
-            if new_file_data['content']:
-                added_files[file_path] = (None, new_file_data['content'])
-            else:
-                added_files[file_path] = (None, new_file_data['hash'])
-        elif old_file_data['hash'] != new_file_data['hash']:
-            if new_file_data['content']:
-                changed_files[file_path] = (old_file_data['content'], new_file_data['content'])
-            else:
-                changed_files[file_path] = (old_file_data['hash'], new_file_data['hash'])
-
-    # Identify removed files
-    for file_path, old_file_data in old_baseline.items():
-        new_file_data = new_baseline.get(file_path)
-        if not new_file_data:
-            if old_file_data['content']:
-                removed_files[file_path] = (old_file_data['content'], None)
-            else:
-                removed_files[file_path] = (old_file_data['hash'], None)
-
-    results = generate_report(added_files, removed_files, changed_files)
+
+def compare_baselines_content(old_baseline_file, new_baseline_file, report):
+    """Compares two baseline files to identify added, removed, and changed files."""
+    changes = diff_records(read_baseline(old_baseline_file), read_baseline(new_baseline_file))
+    results = generate_content_report(changes)
 
     with open(report, "w") as f:
         f.write(results)
 
 
-def generate_report(added_files, removed_files, changed_files):
-    """Generates an HTML report of added, removed, and changed files."""
+def generate_report(added_files, removed_files, changed_files, options=None):
+    """
+    Generates an HTML report of added, removed, and changed files.
+
+    Contents are bytes, or a str digest for files recorded without content.
+    See line_diff.diff_html for the context and size/time limits in `options`.
+    """
     report = []
     
     if added_files:
         report.append('<h2>Added files:</h2>')
         for path, (content1, content2) in added_files.items():
             report.append(f'<h3>{path}</h3>')
-            diff = difflib.HtmlDiff().make_file("", content2.splitlines())
-            report.extend(diff.split('\n')[3:-1])
+            report.append(diff_html(None, content2, options))
     
     if removed_files:
         report.append('<h2>Removed files:</h2>')
         for path, (content1, content2) in removed_files.items():
             report.append(f'<h3>{path}</h3>')
-            diff = difflib.HtmlDiff().make_file(content1.splitlines(), "")
-            report.extend(diff.split('\n')[3:-1])
+            report.append(diff_html(content1, None, options))
     
     if changed_files:
         report.append('<h2>Changed files:</h2>')
         for path, (content1, content2) in changed_files.items():
             report.append(f'<h3>{path}</h3>')
-            diff = difflib.HtmlDiff().make_file(content1.splitlines(), content2.splitlines())
-            report.extend(diff.split('\n')[3:-1])
+            report.append(diff_html(content1, content2, options))
     
     report_html = '<html><body>' + ''.join(report) + '</body></html>'
-    return report_html
\ No newline at end of file
+    return report_html